@@ -0,0 +1,309 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import transl
+
+DEFAULT_SIZES = [1_000, 10_000, 50_000]
+DEFAULT_REPEAT = 3
+DEFAULT_OUTPUT_LINES = 1_000_000
+DEFAULT_INSTANCES = 200_000
+NESTING_DEPTH = 6
+
+UNIT = '''define score_{n}(values, bonus):
+    total becomes 0
+    repeat i from 1 to 200:
+        total add i multiply bonus
+    for value within values:
+{conditionals}
+    give total
+
+class Counter_{n}:
+    define _initialize(self, name):
+        own.name becomes name
+        own.counts becomes {{}}
+
+    define count(self, key):
+        own.counts[key] becomes own.counts.get(key, 0) add 1
+        give own.counts[key]
+
+stats_{n} becomes {{"id": {n}, "label": "unit {n}", "score": score_{n}(list(range(-20, 80)), 2)}}
+counter_{n} becomes Counter_{n}("c{n}")
+counter_{n}.count("a")
+counter_{n}.count(stats_{n}["label"])
+
+'''
+
+def nested_conditionals(depth, indent=8):
+    lines = []
+    for level in range(depth):
+        pad = " " * (indent + 4 * level)
+        lines.append(f"{pad}if value is greater than {level}:")
+    pad = " " * (indent + 4 * depth)
+    lines.append(f"{pad}total add value modulus {depth}")
+    for level in reversed(range(depth)):
+        pad = " " * (indent + 4 * level)
+        lines.append(f"{pad}else if value is at most -{level + 1}:")
+        lines.append(f"{pad}    total subtract value integer divide 3")
+        lines.append(f"{pad}otherwise:")
+        lines.append(f"{pad}    total becomes total power 1")
+    return "\n".join(lines)
+
+def generate_program(lines):
+    # Repeats one unit of loops, a class, dicts and nested conditionals until
+    # the program is about `lines` lines long.
+    conditionals = nested_conditionals(NESTING_DEPTH)
+    units = []
+    count = 0
+    n = 0
+    while count < lines:
+        unit = UNIT.format(n=n, conditionals=conditionals)
+        units.append(unit)
+        count += unit.count("\n")
+        n += 1
+    return "".join(units)
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_code(code):
+    with contextlib.redirect_stdout(io.StringIO()):
+        exec(code, {"__name__": "__main__"})
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_program(lines, repeat):
+    source = generate_program(lines)
+    line_count = source.count("\n")
+    code = transl.compile_cl(source, "<benchmark>")
+
+    translate_time = best_time(lambda: transl.cl_to_py(source), repeat)
+    compile_time = best_time(lambda: transl.compile_cl(source, "<benchmark>"), repeat)
+    exec_time = best_time(lambda: run_code(code), repeat)
+    return {
+        "lines": line_count,
+        "cl_to_py_seconds": translate_time,
+        "cl_to_py_lines_per_second": line_count / translate_time,
+        "compile_seconds": compile_time,
+        "compile_lines_per_second": line_count / compile_time,
+        "exec_seconds": exec_time,
+        "compile_peak_bytes": peak_memory(lambda: transl.compile_cl(source, "<benchmark>")),
+        "exec_peak_bytes": peak_memory(lambda: run_code(code)),
+    }
+
+def bench_output(lines, repeat):
+    # Runs a loop that prints `lines` lines through transl.py with stdout
+    # going to a file, with and without --buffered-output. Unbuffered stdout
+    # (PYTHONUNBUFFERED, python -u) writes once per print, which is where
+    # the buffer pays off the most.
+    transl_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transl.py")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        program = os.path.join(directory, "output.cl")
+        with open(program, 'w') as file:
+            file.write(f"repeat i from 1 to {lines}:\n    output \"line\", i\n")
+        for unbuffered in (False, True):
+            env = dict(os.environ)
+            env.pop("PYTHONUNBUFFERED", None)
+            if unbuffered:
+                env["PYTHONUNBUFFERED"] = "1"
+            for flags in ([], ["--buffered-output"]):
+                command = [sys.executable, transl_path, program] + flags
+
+                def run_once():
+                    with open(os.path.join(directory, "stdout.txt"), 'wb') as stdout:
+                        subprocess.run(command, stdout=stdout, env=env, check=True)
+
+                seconds = best_time(run_once, repeat)
+                results.append({
+                    "lines": lines,
+                    "buffered_output": bool(flags),
+                    "python_unbuffered": unbuffered,
+                    "seconds": seconds,
+                    "lines_per_second": lines / seconds,
+                })
+    return results
+
+INSTANCE_CLASS = '''{keyword}class Player(name, health becomes 100):
+    own.name becomes name
+    own.health becomes health
+    own.inventory becomes nothing
+
+    define take_damage(self, amount):
+        own.health subtract amount
+
+players becomes [Player(i) for i in range({count})]
+'''
+
+def bench_instances(count, repeat):
+    # Memory and creation time for `count` instances of the same class,
+    # once with the inferred __slots__ and once declared `dynamic`.
+    results = []
+    for keyword in ("", "dynamic "):
+        code = transl.compile_cl(INSTANCE_CLASS.format(keyword=keyword, count=count), "<benchmark>")
+        results.append({
+            "instances": count,
+            "slots": not keyword,
+            "create_seconds": best_time(lambda: run_code(code), repeat),
+            "peak_bytes": peak_memory(lambda: run_code(code)),
+        })
+    return results
+
+def load_highlighter():
+    # The IDE needs PySide6 and a display; offscreen lets the highlighter run
+    # without one. Returns None when PySide6 is not installed.
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ide"))
+    try:
+        from PySide6.QtGui import QTextDocument
+        from PySide6.QtWidgets import QApplication
+        import ide
+    except ImportError:
+        return None
+    application = QApplication.instance() or QApplication([])
+    return application, QTextDocument, ide.SyntaxHighlighter
+
+def bench_highlighter(highlighter_parts, lines, repeat):
+    application, QTextDocument, SyntaxHighlighter = highlighter_parts
+    document = QTextDocument()
+    document.setPlainText(generate_program(lines))
+    highlighter = SyntaxHighlighter(document)
+
+    def cold():
+        highlighter.scan_block.cache_clear()
+        highlighter.rehighlight()
+
+    return {
+        "lines": document.blockCount(),
+        "highlight_cold_seconds": best_time(cold, repeat),
+        "highlight_warm_seconds": best_time(highlighter.rehighlight, repeat),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, repeat, highlight=True, output_lines=DEFAULT_OUTPUT_LINES, instances=DEFAULT_INSTANCES):
+    results = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "programs": [],
+        "highlighter": [],
+        "output": [],
+        "instances": [],
+    }
+    for lines in sizes:
+        result = bench_program(lines, repeat)
+        results["programs"].append(result)
+        print(f"{result['lines']:>8} lines  compile_cl {result['compile_lines_per_second']:>10,.0f} lines/s  "
+              f"({result['compile_seconds']:.3f} s)  exec {result['exec_seconds']:.3f} s  "
+              f"peak {result['exec_peak_bytes'] / 1024 / 1024:.1f} MB", file=sys.stderr)
+
+    if instances:
+        results["instances"] = bench_instances(instances, repeat)
+        for result in results["instances"]:
+            kind = "slotted" if result["slots"] else "dynamic"
+            print(f"{result['instances']:>8} {kind} instances  {result['create_seconds']:.3f} s  "
+                  f"peak {result['peak_bytes'] / 1024 / 1024:.1f} MB  "
+                  f"{result['peak_bytes'] / result['instances']:.0f} bytes each", file=sys.stderr)
+
+    if output_lines:
+        results["output"] = bench_output(output_lines, repeat)
+        for result in results["output"]:
+            mode = "--buffered-output" if result["buffered_output"] else "default"
+            stdout = "unbuffered stdout" if result["python_unbuffered"] else "buffered stdout"
+            print(f"{result['lines']:>8} lines  output {mode:<17} {stdout:<17} {result['seconds']:.3f} s  "
+                  f"{result['lines_per_second']:>10,.0f} lines/s", file=sys.stderr)
+
+    highlighter_parts = load_highlighter() if highlight else None
+    if highlighter_parts is None:
+        results["highlighter"] = None
+        if highlight:
+            print("highlighter: skipped, PySide6 is not installed", file=sys.stderr)
+    else:
+        for lines in sizes:
+            result = bench_highlighter(highlighter_parts, lines, repeat)
+            results["highlighter"].append(result)
+            print(f"{result['lines']:>8} lines  highlight cold {result['highlight_cold_seconds']:.3f} s  "
+                  f"warm {result['highlight_warm_seconds']:.3f} s", file=sys.stderr)
+    return results
+
+def row_key(row):
+    return tuple(value for metric, value in row.items()
+                 if metric in ("lines", "instances") or isinstance(value, bool))
+
+def compare(baseline, current):
+    # Prints the change of every metric measured in both runs, matched by
+    # program size. Positive means slower or bigger, except for throughput.
+    print(f"baseline {baseline.get('commit')}  current {current.get('commit')}")
+    for section in ("programs", "highlighter", "output", "instances"):
+        old_rows = {row_key(row): row for row in baseline.get(section) or []}
+        for row in current.get(section) or []:
+            old = old_rows.get(row_key(row))
+            if old is None:
+                continue
+            for metric, value in row.items():
+                if isinstance(value, bool) or metric in ("lines", "instances") or not old.get(metric):
+                    continue
+                change = value / old[metric] - 1
+                label = " ".join(str(value) for value in row_key(row))
+                print(f"{section:>12} {label:<16} {metric:<28} {old[metric]:>14,.4f} -> {value:>14,.4f}  {change:+7.1%}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark.py",
+                                     description="Benchmark the CobraLang translator, runtime and IDE highlighter.")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file instead of stdout")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="program sizes in lines (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="runs per measurement, the best one is kept (default: %(default)s)")
+    parser.add_argument("--output-lines", type=int, default=DEFAULT_OUTPUT_LINES,
+                        help="lines printed by the output benchmark, 0 to skip it (default: %(default)s)")
+    parser.add_argument("--instances", type=int, default=DEFAULT_INSTANCES,
+                        help="instances created by the class memory benchmark, 0 to skip it (default: %(default)s)")
+    parser.add_argument("--no-highlight", action="store_true", help="skip the IDE highlighter benchmark")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare the results with an earlier JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, not args.no_highlight, args.output_lines, args.instances)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,276 @@
 from PySide6.QtWidgets import (QMainWindow, QApplication, QVBoxLayout, QWidget,
                               QPushButton, QFileDialog, QTextEdit, QTreeView, QFileSystemModel, 
-                              QSplitter, QToolBar, QLabel, QPlainTextEdit, QLineEdit, QDialog, QGridLayout, QLineEdit, QPushButton)
-from PySide6.QtGui import QFont, QAction, QKeySequence, QSyntaxHighlighter, QTextCharFormat, QColor, QTextCursor
-from PySide6.QtCore import Qt, QDir, QSize
+                              QSplitter, QToolBar, QLabel, QPlainTextEdit, QLineEdit, QDialog, QGridLayout, QLineEdit, QPushButton, QCheckBox,
+                              QProgressBar, QListWidget, QListWidgetItem)
+from PySide6.QtGui import QFont, QAction, QKeySequence, QSyntaxHighlighter, QTextCharFormat, QColor, QTextCursor, QTextDocument
+from PySide6.QtCore import (Qt, QDir, QSize, QObject, QRunnable, QThread, QThreadPool, QTimer, QProcess, QRegularExpression,
+                            QFileSystemWatcher, Signal)
+import codecs
+import collections
+import functools
+import mmap
+import multiprocessing
+import re
 import sys
-import subprocess
 import os
+import time
+import symbols
+import transl
+from runner import WarmRunner
+
+DIAGNOSTICS_DELAY_MS = 400
+
+# Files above LARGE_FILE_BYTES are memory-mapped and fed to the editor in
+# LOAD_CHUNK_BYTES pieces; above HIGHLIGHT_LIMIT_BYTES highlighting and live
+# diagnostics are switched off.
+LARGE_FILE_BYTES = 1024 * 1024
+HIGHLIGHT_LIMIT_BYTES = 2 * 1024 * 1024
+LOAD_CHUNK_BYTES = 512 * 1024
+
+# The terminal keeps its last TERMINAL_MAX_LINES lines (0 keeps everything)
+# and takes in output every TERMINAL_FLUSH_MS rather than on every write.
+TERMINAL_MAX_LINES = 10000
+TERMINAL_FLUSH_MS = 50
+
+# The workspace index scans files INDEX_BATCH_SIZE at a time on
+# INDEX_THREADS threads, and waits INDEX_REFRESH_MS after a change in the
+# folder before looking at it, since changes tend to come in bursts.
+INDEX_THREADS = 4
+INDEX_BATCH_SIZE = 64
+INDEX_REFRESH_MS = 200
+
+# Diagnostics parse the buffer one top-level statement at a time and memoise
+# each piece on its text, so after a keystroke only the edited statement is
+# parsed again. A piece's error is moved down by the line the piece starts
+# on. Only an error at the end of a piece, which a statement split in the
+# wrong place would also give, has the whole buffer parsed to confirm it.
+CONTINUATION_WORDS = ("else", "elif", "otherwise", "except", "finally", ")", "]", "}")
+
+def top_level_chunks(text):
+    # Yields (first line number, text) for each top-level statement.
+    chunk = []
+    start = 1
+    in_string = False
+    for number, line in enumerate(text.splitlines(), 1):
+        starts_statement = line[:1] not in ("", " ", "\t", "#") and not line.startswith(CONTINUATION_WORDS)
+        if starts_statement and chunk and not chunk[-1].startswith("@") and not in_string:
+            yield start, "\n".join(chunk)
+            chunk = []
+        if line.strip() or chunk:
+            if not chunk:
+                start = number
+            chunk.append(line)
+        # A line inside a triple-quoted string never starts a new statement.
+        if line.count('"""') % 2 or line.count("'''") % 2:
+            in_string = not in_string
+    if chunk:
+        yield start, "\n".join(chunk)
+
+def check_source(text):
+    try:
+        transl.compile_cl(text, "<editor>")
+    except SyntaxError as e:
+        return (e.lineno or 1, e.msg)
+    except ValueError as e:
+        return (1, str(e))
+    return None
+
+check_chunk = functools.lru_cache(maxsize=4096)(check_source)
+
+class RunThread(QThread):
+    output = Signal(str, str)
+
+    def __init__(self, runner, file_path, source, cwd):
+        super().__init__()
+        self.runner = runner
+        self.file_path = file_path
+        self.source = source
+        self.cwd = cwd
+        self.status = None
+
+    def run(self):
+        self.status = self.runner.run(self.file_path, self.source, self.cwd, self.output.emit)
+
+class TerminalSink(QObject):
+    # Everything shown in the terminal goes through here. Writes are queued
+    # and inserted in one piece per flush, the widget drops its oldest lines
+    # past max_lines, and queued text that would be dropped straight away is
+    # never inserted, so a program printing millions of lines costs the IDE
+    # a fixed amount of memory. With a spill file, all of it is also written
+    # there as it arrives.
+    def __init__(self, terminal, max_lines=TERMINAL_MAX_LINES, interval=TERMINAL_FLUSH_MS):
+        super().__init__(terminal)
+        self.terminal = terminal
+        self.pending = collections.deque()
+        self.pending_lines = 0
+        self.empty = True
+        self.spill = None
+        self.spill_path = None
+        self.set_max_lines(max_lines)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def set_max_lines(self, max_lines):
+        self.max_lines = max_lines
+        self.terminal.setMaximumBlockCount(max_lines)
+
+    def write(self, text):
+        if not text:
+            return
+        if self.spill is not None:
+            self.spill.write(text)
+        self.pending.append(text)
+        self.pending_lines += text.count("\n")
+        self.empty = False
+        while (self.max_lines and len(self.pending) > 1
+               and self.pending_lines - self.pending[0].count("\n") >= self.max_lines):
+            self.pending_lines -= self.pending.popleft().count("\n")
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def append_line(self, text):
+        # Same as QPlainTextEdit.appendPlainText: text starts a new line.
+        self.write(text if self.empty else "\n" + text)
+
+    def flush(self):
+        self.timer.stop()
+        if self.spill is not None:
+            self.spill.flush()
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending.clear()
+        self.pending_lines = 0
+        self.terminal.moveCursor(QTextCursor.End)
+        self.terminal.insertPlainText(text)
+
+    def start_spill(self, path):
+        self.stop_spill()
+        self.spill = open(path, 'w', errors="replace")
+        self.spill_path = os.path.abspath(path)
+
+    def stop_spill(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+def utf16_length(text, end):
+    # Qt counts positions in UTF-16 code units, Python in code points.
+    if text.isascii():
+        return end
+    return len(text[:end].encode("utf-16-le")) // 2
+
+class DiagnosticsSignals(QObject):
+    finished = Signal(int, object)
+
+class DiagnosticsTask(QRunnable):
+    def __init__(self, generation, text):
+        super().__init__()
+        self.generation = generation
+        self.text = text
+        self.signals = DiagnosticsSignals()
+
+    def run(self):
+        error = None
+        chunks = top_level_chunks(self.text)
+        for start, chunk in chunks:
+            error = check_chunk(chunk)
+            if error is None:
+                continue
+            line, message = error
+            if line > chunk.count("\n") and next(chunks, None) is not None:
+                error = check_source(self.text)
+            else:
+                error = (start + line - 1, message)
+            break
+        self.signals.finished.emit(self.generation, error)
+
+class IndexSignals(QObject):
+    finished = Signal(object)
+
+class ListSourcesTask(QRunnable):
+    def __init__(self, generation, directory, recursive):
+        super().__init__()
+        self.generation = generation
+        self.directory = directory
+        self.recursive = recursive
+        self.sources = {}
+        self.directories = []
+        self.signals = IndexSignals()
+
+    def run(self):
+        self.sources, self.directories = symbols.list_sources(self.directory, self.recursive)
+        self.signals.finished.emit(self)
+
+class ScanFilesTask(QRunnable):
+    def __init__(self, generation, paths):
+        super().__init__()
+        self.generation = generation
+        self.paths = paths
+        self.results = {}
+        self.signals = IndexSignals()
+
+    def run(self):
+        self.results = {path: symbols.scan_file(path) for path in self.paths}
+        self.signals.finished.emit(self)
 
 class SyntaxHighlighter(QSyntaxHighlighter):
+    # Block states: 0 is normal code, the others mean the block ends inside a
+    # triple-quoted string that the next block has to continue.
+    STATE_FOR_QUOTE = {'"""': 1, "'''": 2}
+    QUOTE_FOR_STATE = {1: '"""', 2: "'''"}
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.highlighting_rules = {}
 
         self.keywords = {
             "define": "#BD93F9",
+            "remember define": "#BD93F9",
+            "keeping": "#BD93F9",
             "give": "#BD93F9",
             "if": "#BD93F9",
             "else if": "#BD93F9",
             "otherwise": "#BD93F9",
             "loop while": "#BD93F9",
             "repeat": "#BD93F9",
+            "in parallel": "#BD93F9",
+            "concurrently": "#BD93F9",
+            "wait for": "#BD93F9",
             "class": "#BD93F9",
+            "dynamic class": "#BD93F9",
             "exit": "#BD93F9",
             "skip": "#BD93F9",
             "not": "#BD93F9",
             "within": "#BD93F9",
+            "and": "#BD93F9",
+            "or": "#BD93F9",
             "output": "#e7f3cb",
+            "is greater than": "#7DCFFF",
+            "is less than": "#7DCFFF",
+            "is equal to": "#7DCFFF",
+            "is not equal to": "#7DCFFF",
+            "is at least": "#7DCFFF",
+            "is at most": "#7DCFFF",
+            "add": "#7DCFFF",
+            "subtract": "#7DCFFF",
+            "multiply": "#7DCFFF",
+            "divide": "#7DCFFF",
+            "integer divide": "#7DCFFF",
+            "modulus": "#7DCFFF",
+            "power": "#7DCFFF",
+            "becomes": "#7DCFFF",
+            "array from": "#7DCFFF",
+            "array of": "#7DCFFF",
+            "sum of": "#7DCFFF",
+            "true": "#FF9E64",
+            "false": "#FF9E64",
+            "nothing": "#FF9E64",
         }
+        self.string_color = "#9ECE6A"
+        self.comment_color = "#565F89"
 
         self.setup_highlighting_rules()
     
@@ -36,13 +280,62 @@ class SyntaxHighlighter(QSyntaxHighlighter):
             text_format.setForeground(QColor(color))
             self.highlighting_rules[word] = text_format
 
+        self.string_format = QTextCharFormat()
+        self.string_format.setForeground(QColor(self.string_color))
+        self.comment_format = QTextCharFormat()
+        self.comment_format.setForeground(QColor(self.comment_color))
+
+        # Longest phrases first, so "is not equal to" wins over "not".
+        phrases = sorted(self.keywords, key=len, reverse=True)
+        keyword_pattern = "|".join(r"\s+".join(map(re.escape, phrase.split())) for phrase in phrases)
+        self.token_regex = re.compile(
+            r'(?P<triple>"""|\'\'\')'
+            r'|(?P<string>"(?:[^"\\]|\\.)*"?|\'(?:[^\'\\]|\\.)*\'?)'
+            r'|(?P<comment>#.*)'
+            rf'|\b(?P<keyword>{keyword_pattern})\b'
+        )
+        # Blocks are highlighted again whenever Qt asks, which is often for
+        # the same text, so results are kept per (text, previous state).
+        self.scan_block = functools.lru_cache(maxsize=20000)(self.scan_block)
+
+    def scan_block(self, text, state):
+        spans = []
+        position = 0
+        if state in self.QUOTE_FOR_STATE:
+            end = text.find(self.QUOTE_FOR_STATE[state])
+            if end < 0:
+                return ((0, len(text), self.string_format),), state
+            position = end + 3
+            spans.append((0, position, self.string_format))
+
+        while True:
+            match = self.token_regex.search(text, position)
+            if match is None:
+                return tuple(spans), 0
+            kind = match.lastgroup
+            start = match.start()
+            if kind == "triple":
+                end = text.find(match.group(), match.end())
+                if end < 0:
+                    spans.append((start, len(text) - start, self.string_format))
+                    return tuple(spans), self.STATE_FOR_QUOTE[match.group()]
+                position = end + 3
+                spans.append((start, position - start, self.string_format))
+                continue
+            if kind == "keyword":
+                text_format = self.highlighting_rules[" ".join(match.group().split())]
+            elif kind == "string":
+                text_format = self.string_format
+            else:
+                text_format = self.comment_format
+            spans.append((start, match.end() - start, text_format))
+            position = match.end()
+
     def highlightBlock(self, text):
-        for word, format in self.highlighting_rules.items():
-            index = text.find(word)
-            while index >= 0:
-                length = len(word)
-                self.setFormat(index, length, format)
-                index = text.find(word, index + length)
+        spans, state = self.scan_block(text, max(self.previousBlockState(), 0))
+        for start, length, text_format in spans:
+            self.setFormat(start, length, text_format)
+        self.setCurrentBlockState(state)
 
 class Button(QPushButton):
     def __init__(self, text, parent=None):
@@ -60,17 +353,23 @@ class FindReplaceDialog(QDialog):
         layout = QGridLayout()
         self.find_input = QLineEdit()
         self.replace_input = QLineEdit()
+        self.regex_checkbox = QCheckBox("Regex")
+        self.whole_word_checkbox = QCheckBox("Whole word")
         self.find_button = QPushButton("Find")
         self.replace_button = QPushButton("Replace")
         self.replace_all_button = QPushButton("Replace All")
+        self.status_label = QLabel("")
 
         layout.addWidget(QLabel("Find:"), 0, 0)
         layout.addWidget(self.find_input, 0, 1)
         layout.addWidget(QLabel("Replace:"), 1, 0)
         layout.addWidget(self.replace_input, 1, 1)
-        layout.addWidget(self.find_button, 2, 0)
-        layout.addWidget(self.replace_button, 2, 1)
-        layout.addWidget(self.replace_all_button, 3, 1)
+        layout.addWidget(self.regex_checkbox, 2, 0)
+        layout.addWidget(self.whole_word_checkbox, 2, 1)
+        layout.addWidget(self.find_button, 3, 0)
+        layout.addWidget(self.replace_button, 3, 1)
+        layout.addWidget(self.replace_all_button, 4, 1)
+        layout.addWidget(self.status_label, 5, 0, 1, 2)
         self.setLayout(layout)
 
         self.find_button.clicked.connect(self.find_next)
@@ -79,22 +378,38 @@ class FindReplaceDialog(QDialog):
 
         self.editor = parent.editor
 
+    def search_regex(self):
+        pattern = self.find_input.text()
+        if not self.regex_checkbox.isChecked():
+            pattern = re.escape(pattern)
+        if self.whole_word_checkbox.isChecked():
+            pattern = rf"\b(?:{pattern})\b"
+        # QTextDocument.find is case insensitive by default, so this is too.
+        return re.compile(pattern, re.IGNORECASE)
+
     def find_next(self):
         search_text = self.find_input.text()
         if not search_text:
             return
 
+        flags = QTextDocument.FindFlag(0)
+        if self.whole_word_checkbox.isChecked():
+            flags |= QTextDocument.FindWholeWords
+        if self.regex_checkbox.isChecked():
+            search_text = QRegularExpression(search_text, QRegularExpression.CaseInsensitiveOption)
+
         cursor = self.editor.textCursor()
         document = self.editor.document()
-        cursor = document.find(search_text, cursor)
+        cursor = document.find(search_text, cursor, flags)
 
         if cursor.isNull():
             start_cursor = QTextCursor(document)
-            cursor = document.find(search_text, start_cursor)
+            cursor = document.find(search_text, start_cursor, flags)
 
         if cursor.isNull():
-            self.terminal.appendPlainText(f"'{search_text}' not found.")
+            self.status_label.setText(f"'{self.find_input.text()}' not found.")
         else:
+            self.status_label.setText("")
             self.editor.setTextCursor(cursor)
 
     def replace(self):
@@ -103,20 +418,98 @@ class FindReplaceDialog(QDialog):
             cursor.insertText(self.replace_input.text())
 
     def replace_all(self):
-        word = self.find_input.text()
+        if not self.find_input.text():
+            return
+        try:
+            regex = self.search_regex()
+        except re.error as e:
+            self.status_label.setText(f"Invalid pattern: {e}")
+            return
+
         replace_text = self.replace_input.text()
-        if not word:
+        text = self.editor.toPlainText()
+        matches = list(regex.finditer(text))
+        if not matches:
+            self.status_label.setText("0 replacements")
             return
-        cursor = self.editor.textCursor()
-        cursor.movePosition(cursor.Start)
-        while True:
-            cursor = self.editor.document().find(word, cursor)
-            if cursor.isNull():
-                break
-            cursor.beginEditBlock()
-            cursor.insertText(replace_text)
-            cursor.endEditBlock()
+
+        # All matches are found in one pass over the text, then only the span
+        # between the first and the last one is swapped out as a single edit,
+        # so the document is re-laid out once and one undo reverts it.
+        # The replacement is built from the matches already found, since
+        # searching the span again would let lookarounds and anchors see its
+        # edges instead of the surrounding text.
+        first, last = matches[0].start(), matches[-1].end()
+        use_groups = self.regex_checkbox.isChecked()
+        parts = []
+        position = first
+        try:
+            for match in matches:
+                parts.append(text[position:match.start()])
+                parts.append(match.expand(replace_text) if use_groups else replace_text)
+                position = match.end()
+        except (re.error, IndexError) as e:
+            # A bad escape or group reference in the replacement, found
+            # before anything in the document has changed.
+            self.status_label.setText(f"Invalid replacement: {e}")
+            return
+        replacement = "".join(parts)
+
+        cursor = QTextCursor(self.editor.document())
+        cursor.beginEditBlock()
+        cursor.setPosition(utf16_length(text, first))
+        cursor.setPosition(utf16_length(text, last), QTextCursor.KeepAnchor)
+        cursor.insertText(replacement)
+        cursor.endEditBlock()
         self.editor.setTextCursor(cursor)
+        self.status_label.setText(f"{len(matches)} replacements")
+
+class SymbolSearchDialog(QDialog):
+    def __init__(self, ide):
+        super().__init__(ide)
+        self.ide = ide
+        self.setWindowTitle("Go to Symbol")
+        self.setModal(True)
+        self.resize(600, 400)
+
+        layout = QVBoxLayout()
+        self.query_input = QLineEdit()
+        self.results_list = QListWidget()
+        self.status_label = QLabel("")
+        layout.addWidget(self.query_input)
+        layout.addWidget(self.results_list)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+        self.query_input.textChanged.connect(self.search)
+        self.query_input.returnPressed.connect(self.open_current)
+        self.results_list.itemActivated.connect(self.open_item)
+        self.search("")
+
+    def search(self, query):
+        index = self.ide.symbol_index
+        self.results_list.clear()
+        if index is None:
+            self.status_label.setText("Open a folder to search its symbols")
+            return
+        for name, path, line, kind, container in index.search(query.strip()):
+            qualified = f"{container}.{name}" if container else name
+            item = QListWidgetItem(f"{qualified}  ({kind})  {os.path.relpath(path, index.root)}:{line}")
+            item.setData(Qt.UserRole, (path, line))
+            self.results_list.addItem(item)
+        self.results_list.setCurrentRow(0)
+        self.status_label.setText(f"{self.results_list.count()} shown of {index.symbol_count()} symbols "
+                                  f"in {len(index.files)} files")
+
+    def open_current(self):
+        item = self.results_list.currentItem()
+        if item is not None:
+            self.open_item(item)
+
+    def open_item(self, item):
+        path, line = item.data(Qt.UserRole)
+        self.accept()
+        self.ide.open_location(path, line)
 
 class CobraLangIDE(QMainWindow):
     def __init__(self):
@@ -131,6 +524,23 @@ class CobraLangIDE(QMainWindow):
         self.current_file_path = None
         self.highlighter = None
         self.current_directory = os.getcwd()
+        self.diagnostics_generation = 0
+        self.diagnostics_tasks = {}
+        self.runner = WarmRunner()
+        self.run_thread = None
+        self.process = None
+        self.run_started = None
+        self.loading = None
+        self.large_file = False
+        self.symbol_index = None
+        self.index_generation = 0
+        self.index_tasks = set()
+        self.index_pending = 0
+        self.index_changed_directories = set()
+        self.index_changed_files = set()
+        self.index_pool = QThreadPool(self)
+        self.index_pool.setMaxThreadCount(INDEX_THREADS)
+        self.index_watcher = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -150,7 +560,8 @@ class CobraLangIDE(QMainWindow):
             ("file-plus-outline", "New File", self.new_file),
             ("file-outline", "Open File", self.open_file),
             ("content-save-outline", "Save File", self.save_file, "Ctrl+S"),
-            ("play-outline", "Run File", self.run_file, "Ctrl+R")
+            ("play-outline", "Run File", self.run_file, "Ctrl+R"),
+            ("stop-outline", "Stop", self.stop_run, "Shift+F5")
         ]
         
         for icon, text, slot, *shortcut in actions:
@@ -163,9 +574,9 @@ class CobraLangIDE(QMainWindow):
         h_splitter = QSplitter(Qt.Horizontal)
         main_layout.addWidget(h_splitter)
 
+        # The model only starts watching once open_folder gives it a root.
         self.file_model = QFileSystemModel()
-        self.file_model.setRootPath("")
-        
+
         self.file_tree = QTreeView()
         self.file_tree.setModel(self.file_model)
         self.file_tree.setRootIndex(self.file_model.index(""))
@@ -192,15 +603,34 @@ class CobraLangIDE(QMainWindow):
         self.filename_label.setContentsMargins(10, 10, 10, 10)
         editor_layout.addWidget(self.filename_label)
 
-        self.editor = QTextEdit()
+        self.editor = QPlainTextEdit()
         self.editor.setFont(QFont("JetBrains Mono", 12))
-        self.editor.setLineWrapMode(QTextEdit.NoWrap)
+        self.editor.setLineWrapMode(QPlainTextEdit.NoWrap)
         self.editor.setTabStopDistance(self.editor.fontMetrics().horizontalAdvance(" ") * 4)
         self.editor.setShortcutEnabled(True)
         self.editor.setFocusPolicy(Qt.StrongFocus)
         self.editor.setContextMenuPolicy(Qt.DefaultContextMenu)
         editor_layout.addWidget(self.editor)
 
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setFixedHeight(4)
+        self.load_progress.setTextVisible(False)
+        self.load_progress.setHidden(True)
+        editor_layout.addWidget(self.load_progress)
+
+        self.diagnostics_label = QLabel("")
+        self.diagnostics_label.setFont(QFont("Inter", 9))
+        self.diagnostics_label.setContentsMargins(10, 4, 10, 4)
+        self.diagnostics_label.setStyleSheet("color: #F7768E;")
+        editor_layout.addWidget(self.diagnostics_label)
+
+        self.diagnostics_timer = QTimer(self)
+        self.diagnostics_timer.setSingleShot(True)
+        self.diagnostics_timer.setInterval(DIAGNOSTICS_DELAY_MS)
+        self.diagnostics_timer.timeout.connect(self.run_diagnostics)
+        self.editor.textChanged.connect(self.diagnostics_timer.start)
+
         self.highlighter = SyntaxHighlighter()
         self.highlighter.setDocument(self.editor.document())
 
@@ -224,7 +654,9 @@ class CobraLangIDE(QMainWindow):
         self.terminal.setReadOnly(True)
         self.terminal.setFont(QFont("JetBrains Mono", 11))
         self.terminal.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.terminal.document().setUndoRedoEnabled(False)
         terminal_layout.addWidget(self.terminal)
+        self.terminal_output = TerminalSink(self.terminal)
         
         v_splitter.addWidget(terminal_container)
 
@@ -238,59 +670,314 @@ class CobraLangIDE(QMainWindow):
         find_replace_action.triggered.connect(self.show_find_replace)
         self.addAction(find_replace_action)
 
+        go_to_definition_action = QAction("Go to Definition", self)
+        go_to_definition_action.setShortcut(QKeySequence("F12"))
+        go_to_definition_action.triggered.connect(self.go_to_definition)
+        self.addAction(go_to_definition_action)
+
+        symbol_search_action = QAction("Go to Symbol", self)
+        symbol_search_action.setShortcut(QKeySequence("Ctrl+T"))
+        symbol_search_action.triggered.connect(self.show_symbol_search)
+        self.addAction(symbol_search_action)
+
+        self.index_timer = QTimer(self)
+        self.index_timer.setSingleShot(True)
+        self.index_timer.setInterval(INDEX_REFRESH_MS)
+        self.index_timer.timeout.connect(self.refresh_index)
+
+    def run_diagnostics(self):
+        if self.large_file or self.loading is not None:
+            return
+        self.diagnostics_generation += 1
+        task = DiagnosticsTask(self.diagnostics_generation, self.editor.toPlainText())
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self.show_diagnostics)
+        self.diagnostics_tasks[task.generation] = task
+        QThreadPool.globalInstance().start(task)
+
+    def show_diagnostics(self, generation, error):
+        self.diagnostics_tasks.pop(generation, None)
+        if generation != self.diagnostics_generation:
+            return
+
+        if error is None:
+            self.editor.setExtraSelections([])
+            self.diagnostics_label.setText("")
+            return
+
+        line_number, message = error
+        block = self.editor.document().findBlockByNumber(line_number - 1)
+        if not block.isValid():
+            block = self.editor.document().lastBlock()
+
+        selection = QTextEdit.ExtraSelection()
+        selection.format.setUnderlineStyle(QTextCharFormat.SpellCheckUnderline)
+        selection.format.setUnderlineColor(QColor("#F7768E"))
+        selection.format.setBackground(QColor("#3B2030"))
+        selection.format.setProperty(QTextCharFormat.FullWidthSelection, True)
+        selection.cursor = QTextCursor(block)
+        selection.cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        self.editor.setExtraSelections([selection])
+        self.diagnostics_label.setText(f"Line {block.blockNumber() + 1}: {message}")
+
     def show_find_replace(self):
         find_replace_dialog = FindReplaceDialog(self)
         find_replace_dialog.exec()
 
+    def show_symbol_search(self):
+        symbol_search_dialog = SymbolSearchDialog(self)
+        symbol_search_dialog.exec()
+
+    def start_indexing(self, folder):
+        # Loads the saved index of folder, then has the thread pool list the
+        # folder and rescan only the files that changed since it was saved.
+        # Results of an earlier folder still in flight are told apart by
+        # their generation and dropped.
+        if self.symbol_index is not None:
+            self.symbol_index.save()
+        self.index_generation += 1
+        self.index_pending = 0
+        self.index_changed_directories.clear()
+        self.index_changed_files.clear()
+        self.symbol_index = symbols.SymbolIndex(folder)
+        self.symbol_index.load()
+        if self.index_watcher is not None:
+            self.index_watcher.deleteLater()
+        self.index_watcher = QFileSystemWatcher(self)
+        self.index_watcher.directoryChanged.connect(self.directory_changed)
+        self.index_watcher.fileChanged.connect(self.file_changed)
+        self.statusBar().showMessage(f"Indexing {self.symbol_index.root}...")
+        self.start_index_task(ListSourcesTask(self.index_generation, self.symbol_index.root, True))
+
+    def start_index_task(self, task):
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self.index_task_finished)
+        self.index_tasks.add(task)
+        self.index_pending += 1
+        self.index_pool.start(task)
+
+    def index_task_finished(self, task):
+        self.index_tasks.discard(task)
+        if task.generation != self.index_generation:
+            return
+        self.index_pending -= 1
+        index = self.symbol_index
+        if isinstance(task, ListSourcesTask):
+            for path in index.vanished(task.directory, task.sources, task.directories, task.recursive):
+                index.remove(path)
+            watched = set(self.index_watcher.directories())
+            new_directories = [directory for directory in task.directories if directory not in watched]
+            if new_directories:
+                self.index_watcher.addPaths(new_directories)
+            # A file rewritten in place does not change its directory, so
+            # the files are watched too. One replaced by a rename drops out
+            # of the watcher and is added back when its directory is listed.
+            watched = set(self.index_watcher.files())
+            new_files = [path for path in task.sources if path not in watched]
+            if new_files:
+                self.index_watcher.addPaths(new_files)
+            if not task.recursive:
+                # A directory that appeared since has not been listed yet.
+                for directory in new_directories:
+                    if directory != task.directory:
+                        self.start_index_task(ListSourcesTask(self.index_generation, directory, True))
+            stale = index.stale(task.sources)
+            for start in range(0, len(stale), INDEX_BATCH_SIZE):
+                self.start_index_task(ScanFilesTask(self.index_generation, stale[start:start + INDEX_BATCH_SIZE]))
+        else:
+            for path, entry in task.results.items():
+                index.update(path, entry)
+        if self.index_pending == 0:
+            index.save()
+            self.statusBar().showMessage(f"Indexed {index.symbol_count()} symbols in {len(index.files)} files", 5000)
+
+    def directory_changed(self, directory):
+        self.index_changed_directories.add(directory)
+        self.index_timer.start()
+
+    def file_changed(self, path):
+        self.index_changed_files.add(path)
+        self.index_timer.start()
+
+    def refresh_index(self):
+        directories = self.index_changed_directories
+        self.index_changed_directories = set()
+        # A file that was removed is dropped when its directory is listed.
+        files = [path for path in self.index_changed_files if os.path.isfile(path)]
+        self.index_changed_files = set()
+        for start in range(0, len(files), INDEX_BATCH_SIZE):
+            self.start_index_task(ScanFilesTask(self.index_generation, files[start:start + INDEX_BATCH_SIZE]))
+        for directory in directories:
+            if os.path.isdir(directory):
+                self.start_index_task(ListSourcesTask(self.index_generation, directory, False))
+            else:
+                for path in self.symbol_index.paths_under(directory):
+                    self.symbol_index.remove(path)
+        if self.index_pending == 0:
+            self.symbol_index.save()
+
+    def index_saved_file(self, file_path):
+        # The IDE's own saves are indexed straight away, without waiting for
+        # the watcher, which has not seen a new file until its directory
+        # has been listed.
+        if self.symbol_index is None or not file_path.endswith(".cl"):
+            return
+        file_path = os.path.abspath(file_path)
+        if file_path.startswith(os.path.join(self.symbol_index.root, "")):
+            self.start_index_task(ScanFilesTask(self.index_generation, [file_path]))
+
+    def go_to_definition(self):
+        cursor = self.editor.textCursor()
+        cursor.select(QTextCursor.WordUnderCursor)
+        name = cursor.selectedText()
+        if not name:
+            return
+        if self.symbol_index is None:
+            self.statusBar().showMessage("Open a folder to look up definitions", 5000)
+            return
+        definitions = self.symbol_index.find(name)
+        if not definitions:
+            self.statusBar().showMessage(f"No definition of {name} found", 5000)
+            return
+        # A definition in the open file wins over ones elsewhere.
+        current_path = os.path.abspath(self.current_file_path) if self.current_file_path else None
+        path, line, _, _ = ([d for d in definitions if d[0] == current_path] or definitions)[0]
+        self.open_location(path, line)
+
+    def open_location(self, path, line):
+        if not self.current_file_path or os.path.abspath(self.current_file_path) != path:
+            self.load_file(path)
+        if self.loading is not None or self.current_file_path is None:
+            return
+        block = self.editor.document().findBlockByNumber(line - 1)
+        if block.isValid():
+            self.editor.setTextCursor(QTextCursor(block))
+            self.editor.centerCursor()
+        self.editor.setFocus()
+
     def execute_command(self):
         command = self.terminal_input.text().strip()
         self.terminal_input.clear()
         if command:
-            self.terminal.appendPlainText(f"> {command}")
+            self.terminal_output.append_line(f"> {command}")
             try:
                 if command.startswith("cobra "):
                     filename = command.split(" ", 1)[1]
-                    self.run_cobra(filename)
+                    if not self.is_running():
+                        self.run_cobra(filename)
                 elif command.startswith("cd "):
                     directory = command.split(" ", 1)[1]
                     os.chdir(directory)
                     self.current_directory = os.getcwd()
-                    self.terminal.appendPlainText(f"Changed directory to: {self.current_directory}")
+                    self.terminal_output.append_line(f"Changed directory to: {self.current_directory}")
                 elif command.startswith("mkdir "):
                     directory = command.split(" ", 1)[1]
                     os.mkdir(directory)
-                    self.terminal.appendPlainText(f"Directory created: {directory}")
+                    self.terminal_output.append_line(f"Directory created: {directory}")
                 elif command.startswith("rm "):
                     target = command.split(" ", 1)[1]
                     os.remove(target)
-                    self.terminal.appendPlainText(f"Removed: {target}")
+                    self.terminal_output.append_line(f"Removed: {target}")
                 elif command == "ls" or command == "dir":
                     contents = "\n".join(os.listdir(self.current_directory))
-                    self.terminal.appendPlainText(contents)
+                    self.terminal_output.append_line(contents)
                 elif command == "pwd":
-                    self.terminal.appendPlainText(self.current_directory)
-                else:
-                    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-                    if result.stdout:
-                        self.terminal.appendPlainText(result.stdout)
-                    if result.stderr:
-                        self.terminal.appendPlainText(f"Error: {result.stderr}")
+                    self.terminal_output.append_line(self.current_directory)
+                elif command == "log off":
+                    self.terminal_output.stop_spill()
+                    self.terminal_output.append_line("Stopped logging terminal output")
+                elif command.startswith("log "):
+                    self.terminal_output.start_spill(command.split(" ", 1)[1])
+                    self.terminal_output.append_line(f"Logging terminal output to: {self.terminal_output.spill_path}")
+                elif command.startswith("lines "):
+                    self.terminal_output.set_max_lines(max(0, int(command.split(" ", 1)[1])))
+                    self.terminal_output.append_line(f"Terminal keeps the last {self.terminal_output.max_lines} lines"
+                                                     if self.terminal_output.max_lines else "Terminal keeps all lines")
+                elif not self.is_running():
+                    self.start_process(command)
             except Exception as e:
-                self.terminal.appendPlainText(f"Error: {e}")
+                self.terminal_output.append_line(f"Error: {e}")
 
     def run_cobra(self, filename):
         try:
             if not os.path.isfile(filename):
-                self.terminal.appendPlainText(f"Error: File '{filename}' not found")
+                self.terminal_output.append_line(f"Error: File '{filename}' not found")
                 return
-            self.terminal.appendPlainText(f"Running: {filename}")
-            result = subprocess.run(["python3", "-m", "transl", filename], capture_output=True, text=True)
-            if result.stdout:
-                self.terminal.appendPlainText(result.stdout)
-            if result.stderr:
-                self.terminal.appendPlainText(f"Error: {result.stderr}")
+            self.terminal_output.append_line(f"Running: {filename}")
+            self.start_run(os.path.abspath(filename))
         except Exception as e:
-            self.terminal.appendPlainText(f"Error: {e}")
+            self.terminal_output.append_line(f"Error: {e}")
+
+    def is_running(self):
+        if self.run_thread is not None or self.process is not None:
+            self.terminal_output.append_line("Error: A program is already running (Shift+F5 stops it)")
+            return True
+        return False
+
+    def start_run(self, file_path):
+        with open(file_path, 'r') as file:
+            source = file.read()
+        self.terminal_output.append_line("")
+        self.run_started = time.perf_counter()
+        self.run_thread = RunThread(self.runner, file_path, source, self.current_directory)
+        self.run_thread.output.connect(self.write_terminal)
+        self.run_thread.finished.connect(self.finish_run)
+        self.run_thread.start()
+
+    def finish_run(self):
+        self.run_thread.wait()
+        status = self.run_thread.status
+        self.run_thread = None
+        self.report_finished(status)
+
+    def start_process(self, command):
+        self.run_started = time.perf_counter()
+        self.process = QProcess(self)
+        self.process.setWorkingDirectory(self.current_directory)
+        self.process.readyReadStandardOutput.connect(
+            lambda: self.write_terminal("stdout", bytes(self.process.readAllStandardOutput()).decode(errors="replace")))
+        self.process.readyReadStandardError.connect(
+            lambda: self.write_terminal("stderr", bytes(self.process.readAllStandardError()).decode(errors="replace")))
+        self.process.finished.connect(self.finish_process)
+        self.terminal_output.append_line("")
+        if sys.platform == "win32":
+            self.process.start("cmd", ["/c", command])
+        else:
+            self.process.start("/bin/sh", ["-c", command])
+
+    def finish_process(self, exit_code, exit_status):
+        self.process.deleteLater()
+        self.process = None
+        self.report_finished(exit_code if exit_status == QProcess.NormalExit else -1)
+
+    def report_finished(self, status):
+        elapsed = time.perf_counter() - self.run_started
+        self.terminal_output.append_line(f"\n--- Execution completed: exit status {status}, {elapsed:.2f} s ---\n")
+
+    def stop_run(self):
+        if self.run_thread is not None:
+            self.runner.stop()
+        elif self.process is not None:
+            self.process.kill()
+
+    def write_terminal(self, stream, text):
+        self.terminal_output.write(text)
+
+    def closeEvent(self, event):
+        self.stop_run()
+        if self.run_thread is not None:
+            self.run_thread.wait()
+        if self.process is not None:
+            self.process.waitForFinished(1000)
+        self.runner.close()
+        self.terminal_output.flush()
+        self.terminal_output.stop_spill()
+        self.index_generation += 1
+        self.index_pool.clear()
+        self.index_pool.waitForDone(1000)
+        if self.symbol_index is not None:
+            self.symbol_index.save()
+        super().closeEvent(event)
 
     def load_theme(self):
         return '''
@@ -405,8 +1092,9 @@ class CobraLangIDE(QMainWindow):
     def open_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Open Folder", QDir.homePath())
         if folder_path:
-            self.file_tree.setRootIndex(self.file_model.index(folder_path))
+            self.file_tree.setRootIndex(self.file_model.setRootPath(folder_path))
             self.file_tree.setHidden(False)
+            self.start_indexing(folder_path)
 
     def open_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open File", QDir.homePath(), "*.*")
@@ -415,16 +1103,88 @@ class CobraLangIDE(QMainWindow):
 
     def load_file(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                content = file.read()
-            self.editor.setPlainText(content)
+            self.cancel_load()
+            size = os.path.getsize(file_path)
+            self.set_large_file(size > HIGHLIGHT_LIMIT_BYTES)
+            if size > LARGE_FILE_BYTES:
+                self.start_chunked_load(file_path)
+            else:
+                with open(file_path, 'r') as file:
+                    content = file.read()
+                self.editor.setPlainText(content)
             self.current_file_path = file_path
             self.filename_label.setText(f" {file_path}")
-
-            if self.highlighter:
-                self.highlighter.setDocument(self.editor.document())
         except Exception as e:
-            self.terminal.appendPlainText(f"Error opening file: {e}")
+            self.terminal_output.append_line(f"Error opening file: {e}")
+
+    def set_large_file(self, large_file):
+        self.large_file = large_file
+        self.highlighter.setDocument(None if large_file else self.editor.document())
+        if large_file:
+            self.diagnostics_timer.stop()
+            self.editor.setExtraSelections([])
+            self.diagnostics_label.setText("Large file: highlighting and diagnostics are off")
+        else:
+            self.diagnostics_label.setText("")
+
+    def start_chunked_load(self, file_path):
+        # Inserting a huge string in one go blocks the event loop, so the file
+        # is mapped and appended a chunk per event-loop turn instead.
+        file = open(file_path, 'rb')
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            file.close()
+            raise
+        self.loading = {
+            "file": file,
+            "mmap": mapped,
+            "decoder": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            "offset": 0,
+            "carry": "",
+        }
+        self.editor.clear()
+        self.editor.setReadOnly(True)
+        self.editor.document().setUndoRedoEnabled(False)
+        self.load_progress.setValue(0)
+        self.load_progress.setHidden(False)
+        QTimer.singleShot(0, self.load_next_chunk)
+
+    def load_next_chunk(self):
+        loading = self.loading
+        if loading is None:
+            return
+        mapped = loading["mmap"]
+        offset = loading["offset"]
+        end = min(offset + LOAD_CHUNK_BYTES, len(mapped))
+        final = end == len(mapped)
+        text = loading["carry"] + loading["decoder"].decode(mapped[offset:end], final)
+        loading["carry"] = ""
+        if text.endswith("\r") and not final:
+            text, loading["carry"] = text[:-1], "\r"
+        text = text.replace("\r\n", "\n")
+
+        cursor = QTextCursor(self.editor.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        loading["offset"] = end
+        self.load_progress.setValue(int(end * 100 / len(mapped)))
+
+        if final:
+            self.cancel_load()
+            self.editor.moveCursor(QTextCursor.Start)
+        else:
+            QTimer.singleShot(0, self.load_next_chunk)
+
+    def cancel_load(self):
+        if self.loading is None:
+            return
+        self.loading["mmap"].close()
+        self.loading["file"].close()
+        self.loading = None
+        self.load_progress.setHidden(True)
+        self.editor.setReadOnly(False)
+        self.editor.document().setUndoRedoEnabled(True)
 
     def open_selected_file(self, index):
         file_path = self.file_model.filePath(index)
@@ -437,42 +1197,53 @@ class CobraLangIDE(QMainWindow):
             try:
                 with open(file_path, 'w') as file:
                     file.write("")
+                self.cancel_load()
                 self.current_file_path = file_path
                 self.filename_label.setText(f" {file_path}")
                 self.editor.setPlainText("")
+                self.set_large_file(False)
             except Exception as e:
-                self.terminal.appendPlainText(f"Error creating file: {e}")
+                self.terminal_output.append_line(f"Error creating file: {e}")
 
     def save_file(self):
         if not self.current_file_path:
             self.new_file()
             return
+        if self.loading is not None:
+            self.terminal_output.append_line("Error: The file is still loading")
+            return
             
         try:
+            # Written block by block so a large buffer is never copied into
+            # one giant string.
             with open(self.current_file_path, 'w') as file:
-                file.write(self.editor.toPlainText())
-            self.terminal.appendPlainText(f"File saved: {self.current_file_path}")
+                block = self.editor.document().begin()
+                while block.isValid():
+                    file.write(block.text())
+                    block = block.next()
+                    if block.isValid():
+                        file.write("\n")
+            self.terminal_output.append_line(f"File saved: {self.current_file_path}")
+            self.index_saved_file(self.current_file_path)
         except Exception as e:
-            self.terminal.appendPlainText(f"Error saving file: {e}")
+            self.terminal_output.append_line(f"Error saving file: {e}")
 
     def run_file(self):
         if not self.current_file_path:
-            self.terminal.appendPlainText("Error: No file is currently open")
+            self.terminal_output.append_line("Error: No file is currently open")
+            return
+        if self.is_running():
             return
             
         try:
-            self.terminal.appendPlainText(f"\n--- Running {self.current_file_path} ---\n")
-            result = subprocess.run(["python3", "-m", "transl", self.current_file_path], 
-                                 capture_output=True, text=True)
-            if result.stdout:
-                self.terminal.appendPlainText(result.stdout)
-            if result.stderr:
-                self.terminal.appendPlainText(f"Error: {result.stderr}")
-            self.terminal.appendPlainText("\n--- Execution completed ---\n")
+            self.terminal_output.append_line(f"\n--- Running {self.current_file_path} ---\n")
+            self.start_run(self.current_file_path)
         except Exception as e:
-            self.terminal.appendPlainText(f"Error executing file: {e}")
+            self.terminal_output.append_line(f"Error executing file: {e}")
 
 if __name__ == "__main__":
+    # In a frozen build, worker processes start this executable again.
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     ide = CobraLangIDE()
     ide.show()
@@ -0,0 +1,234 @@
+import atexit
+import collections
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import traceback
+
+WORKER_COUNT = 1
+MAX_RUNS_PER_WORKER = 25
+OUTPUT_CHUNK_SIZE = 8192
+OUTPUT_FLUSH_INTERVAL = 0.05
+
+# Forking a process that runs Qt threads is not safe, so workers are always
+# started fresh.
+context = multiprocessing.get_context("spawn")
+
+def start_process(process):
+    # A spawned child first imports the parent's __main__ module, which for
+    # the IDE is ide.py and with it all of Qt. Starting the child while this
+    # module stands in as __main__ makes it import only this module.
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = sys.modules[__name__]
+    try:
+        process.start()
+    finally:
+        sys.modules["__main__"] = main
+
+# Serialises sends on a worker's connection, which cannot be sent on from two
+# threads at once. A program that forks, as `repeat in parallel` does, must
+# not fork while the OutputFlusher holds it, or the child inherits it locked.
+output_lock = threading.Lock()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=output_lock.acquire, after_in_parent=output_lock.release,
+                        after_in_child=output_lock.release)
+
+class PipeWriter(io.TextIOBase):
+    # Stands in for sys.stdout/sys.stderr inside a worker and forwards what
+    # the program writes to the IDE in chunks rather than one message per
+    # write. Whatever is still pending is sent by an OutputFlusher, so output
+    # shows up while a program is busy, not just when it writes more.
+    def __init__(self, connection, stream):
+        self.connection = connection
+        self.stream = stream
+        self.pid = os.getpid()
+        self.pending = []
+        self.pending_size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with output_lock:
+            self.pending.append(text)
+            self.pending_size += len(text)
+            if self.pending_size >= OUTPUT_CHUNK_SIZE:
+                self.send_pending()
+        return len(text)
+
+    def flush(self):
+        with output_lock:
+            self.send_pending()
+
+    def send_pending(self):
+        # A process forked from the worker shares the connection, but what
+        # it holds pending was already there in the worker, and anything it
+        # writes itself is passed back to the worker by the program.
+        if os.getpid() != self.pid:
+            self.pending = []
+            self.pending_size = 0
+        if self.pending:
+            self.connection.send((self.stream, "".join(self.pending)))
+            self.pending = []
+            self.pending_size = 0
+
+class OutputFlusher(threading.Thread):
+    # Flushes the writers every OUTPUT_FLUSH_INTERVAL while a program runs.
+    def __init__(self, writers):
+        super().__init__(daemon=True)
+        self.writers = writers
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(OUTPUT_FLUSH_INTERVAL):
+            try:
+                for writer in self.writers:
+                    writer.flush()
+            except OSError:
+                # The IDE went away; the worker is about to be replaced.
+                return
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+def run_program(connection, file_path, source, cwd):
+    import transl
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = PipeWriter(connection, "stdout")
+    sys.stderr = PipeWriter(connection, "stderr")
+    flusher = OutputFlusher([sys.stdout, sys.stderr])
+    flusher.start()
+    status = 0
+    finder = None
+    path = list(sys.path)
+    modules = set(sys.modules)
+    try:
+        os.chdir(cwd)
+        finder = transl.install_importer(os.path.dirname(file_path))
+        code = transl.compile_cl(source, file_path)
+        transl.run_code(code, {"__name__": "__main__", "__file__": file_path})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        # Skip this frame so the traceback starts in the CobraLang program.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    finally:
+        flusher.stop()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sys.stdout, sys.stderr = stdout, stderr
+        # The worker is reused, so the next run must import .cl modules
+        # afresh in case they were edited in the meantime.
+        sys.path[:] = path
+        if finder is not None:
+            for name in (set(sys.modules) - modules) & finder.module_names:
+                del sys.modules[name]
+    return status
+
+def worker_main(connection):
+    import transl  # noqa: F401 - imported up front so runs start warm
+
+    sys.stdin = open(os.devnull)
+    while True:
+        try:
+            file_path, source, cwd = connection.recv()
+        except (EOFError, OSError):
+            return
+        connection.send(("exit", run_program(connection, file_path, source, cwd)))
+
+class Worker:
+    def __init__(self):
+        self.connection, child_connection = context.Pipe()
+        # Not a daemon, so that programs can start processes of their own,
+        # as `repeat in parallel` does. WarmRunner.close shuts workers down.
+        self.process = context.Process(target=worker_main, args=(child_connection,))
+        start_process(self.process)
+        child_connection.close()
+        self.runs = 0
+
+    def close(self):
+        self.connection.close()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(1)
+
+class WarmRunner:
+    # Keeps a few worker processes with the translator already imported, so a
+    # run only pays for translation and execution. Workers are replaced after
+    # MAX_RUNS_PER_WORKER runs, or as soon as one crashes or is stopped.
+    def __init__(self, size=WORKER_COUNT, max_runs=MAX_RUNS_PER_WORKER):
+        self.size = size
+        self.max_runs = max_runs
+        self.idle = collections.deque(Worker() for _ in range(size))
+        self.active = None
+        self.stopped = False
+        # Python waits for non-daemon processes on exit, so make sure they
+        # are gone even if the IDE does not get to close the runner.
+        atexit.register(self.close)
+
+    def acquire(self):
+        while self.idle:
+            worker = self.idle.popleft()
+            if worker.process.is_alive():
+                return worker
+            worker.close()
+        return Worker()
+
+    def release(self, worker, reusable=True):
+        worker.runs += 1
+        if reusable and worker.runs < self.max_runs and worker.process.is_alive():
+            self.idle.append(worker)
+        else:
+            worker.close()
+        while len(self.idle) < self.size:
+            self.idle.append(Worker())
+
+    def run(self, file_path, source, cwd, on_output):
+        worker = self.acquire()
+        self.active = worker
+        self.stopped = False
+        status = None
+        try:
+            worker.connection.send((file_path, source, cwd))
+            while status is None:
+                kind, value = worker.connection.recv()
+                if kind == "exit":
+                    status = value
+                else:
+                    on_output(kind, value)
+        except (EOFError, OSError):
+            pass
+        self.active = None
+
+        if status is None:
+            worker.process.join(1)
+            if self.stopped:
+                on_output("stderr", "Run stopped\n")
+            else:
+                on_output("stderr", f"Worker process exited unexpectedly (exit code {worker.process.exitcode})\n")
+            self.release(worker, reusable=False)
+            return -1
+        self.release(worker)
+        return status
+
+    def stop(self):
+        # Killing the worker is the only reliable way to interrupt arbitrary
+        # code; run() notices the closed pipe and replaces the worker.
+        worker = self.active
+        if worker is not None:
+            self.stopped = True
+            worker.process.terminate()
+
+    def close(self):
+        self.stop()
+        while self.idle:
+            self.idle.popleft().close()
@@ -0,0 +1,199 @@
+import json
+import os
+import re
+
+import transl
+
+INDEX_FILE_NAME = "symbols.json"
+INDEX_VERSION = 1
+SKIPPED_DIRECTORIES = {transl.CACHE_DIR_NAME, "__pycache__", "node_modules"}
+
+DEFINITION = re.compile(r"(?P<indent>[ \t]*)(?:(?:remember[ \t]+)?(?:define|def)|(?:dynamic[ \t]+)?(?P<class>class))"
+                        r"[ \t]+(?P<name>\w+)")
+
+def scan_source(text):
+    # Finds `define` and `class` lines without parsing, so files with syntax
+    # errors still get indexed. Each symbol is (name, kind, line, container),
+    # where container is the dotted path of the definitions around it.
+    symbols = []
+    scopes = []
+    in_string = False
+    for number, line in enumerate(text.splitlines(), 1):
+        if not in_string:
+            match = DEFINITION.match(line)
+            if match:
+                indent = len(match.group("indent").expandtabs(4))
+                while scopes and scopes[-1][0] >= indent:
+                    scopes.pop()
+                name = match.group("name")
+                kind = "class" if match.group("class") else "function"
+                symbols.append((name, kind, number, ".".join(scope for _, scope in scopes)))
+                scopes.append((indent, name))
+        if line.count('"""') % 2 or line.count("'''") % 2:
+            in_string = not in_string
+    return symbols
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def scan_file(path):
+    # Returns (stamp, symbols), or None when the file cannot be read.
+    stamp = file_stamp(path)
+    if stamp is None:
+        return None
+    try:
+        with open(path, 'r', errors="replace") as file:
+            return (stamp, scan_source(file.read()))
+    except OSError:
+        return None
+
+def list_sources(directory, recursive=True):
+    # Returns the .cl files under directory with their stamps, and the
+    # directories found, leaving out caches and hidden directories. Without
+    # recursive, only directory itself is listed, but its subdirectories
+    # are still returned.
+    sources = {}
+    directories = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        directories.append(current)
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.startswith(".") or entry.name in SKIPPED_DIRECTORIES:
+                        continue
+                    if recursive:
+                        pending.append(entry.path)
+                    else:
+                        directories.append(entry.path)
+                elif entry.name.endswith(".cl"):
+                    stat = entry.stat()
+                    sources[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+    return sources, directories
+
+class SymbolIndex:
+    # Definitions of every .cl file under root, kept up to date by the IDE
+    # and saved to root/__clcache__/symbols.json, so reopening a folder only
+    # rescans the files that changed since.
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.files = {}
+        self.names = {}
+        self.changed = False
+
+    @property
+    def path(self):
+        return os.path.join(self.root, transl.CACHE_DIR_NAME, INDEX_FILE_NAME)
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        for relative_path, (mtime, size, symbols) in data.get("files", {}).items():
+            path = os.path.join(self.root, relative_path)
+            self.update(path, ((mtime, size), [tuple(symbol) for symbol in symbols]))
+        self.changed = False
+        return True
+
+    def save(self):
+        if not self.changed:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "files": {os.path.relpath(path, self.root): [stamp[0], stamp[1], symbols]
+                      for path, (stamp, symbols) in self.files.items()},
+        }
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w') as file:
+                json.dump(data, file)
+            os.replace(temp_path, self.path)
+            self.changed = False
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def stale(self, sources):
+        # Files in sources that are new or changed since they were indexed.
+        return [path for path, stamp in sources.items()
+                if path not in self.files or self.files[path][0] != stamp]
+
+    def paths_under(self, directory):
+        prefix = os.path.join(directory, "")
+        return [path for path in self.files if path.startswith(prefix)]
+
+    def vanished(self, directory, sources, directories, recursive=True):
+        # Indexed files under directory that a list_sources() of it no
+        # longer has. A listing that did not descend only vouches for the
+        # files in directory and for which subdirectories still exist.
+        directories = set(directories)
+        gone = []
+        for path in self.paths_under(directory):
+            if path in sources:
+                continue
+            if recursive or os.path.dirname(path) == directory:
+                gone.append(path)
+            elif os.path.join(directory, os.path.relpath(path, directory).split(os.sep)[0]) not in directories:
+                gone.append(path)
+        return gone
+
+    def update(self, path, entry):
+        # entry is what scan_file returned; None removes the file.
+        self.remove(path)
+        if entry is None:
+            return
+        self.files[path] = entry
+        for name, kind, line, container in entry[1]:
+            self.names.setdefault(name, []).append((path, line, kind, container))
+        self.changed = True
+
+    def remove(self, path):
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return
+        for name in {symbol[0] for symbol in entry[1]}:
+            definitions = [definition for definition in self.names[name] if definition[0] != path]
+            if definitions:
+                self.names[name] = definitions
+            else:
+                del self.names[name]
+        self.changed = True
+
+    def find(self, name):
+        # Definitions of exactly this name, as (path, line, kind, container).
+        return sorted(self.names.get(name, []))
+
+    def search(self, query, limit=200):
+        # Definitions whose name contains query, ignoring case. Names that
+        # start with it come first, then shorter names.
+        query = query.lower()
+        names = [name for name in self.names if query in name.lower()]
+        names.sort(key=lambda name: (not name.lower().startswith(query), len(name), name))
+        results = []
+        for name in names:
+            for path, line, kind, container in sorted(self.names[name]):
+                results.append((name, path, line, kind, container))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def symbol_count(self):
+        return sum(len(symbols) for _, symbols in self.files.values())
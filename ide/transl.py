@@ -1,61 +1,3129 @@
+import argparse
+import array
+import ast
+import asyncio
+import _thread
+import collections
+import concurrent.futures
+import contextlib
+import cProfile
+import faulthandler
+import functools
+import gc
+import hashlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import inspect
+import io
+import itertools
+import json
+import keyword
+import linecache
+import marshal
+import multiprocessing
+import operator
+import os
+import pstats
 import re
 import sys
+import threading
+import time
+import tokenize
+import tracemalloc
+import types
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TRANSLATIONS = [
+    (r'\bdefine\b', 'def'),
+    (r'\boutput\s+"(.*?)"', r'print("\1")'),
+    (r'\boutput\s+(.*)', r'print(\1)'),
+    (r'\botherwise\b', 'else:'),
+    (r'\belse if\b', 'elif'),
+    (r'\brepeat (\w+) from (\d+) to (\d+):', r'for \1 in range(\2, \3 + 1):'),
+    (r'\bloop while\b', 'while'),
+    (r'\bexit\b', 'break'),
+    (r'\bskip\b', 'continue'),
+    (r'\bgive\b', 'return'),
+    (r'\bis greater than\b', '>'),
+    (r'\bis less than\b', '<'),
+    (r'\bis equal to\b', '=='),
+    (r'\bis not equal to\b', '!='),
+    (r'\bis at least\b', '>='),
+    (r'\bis at most\b', '<='),
+    (r'\bwithin\b', 'in'),
+    (r'\badd\b', '+'),
+    (r'\bsubtract\b', '-'),
+    (r'\bmultiply\b', '*'),
+    (r'\bdivide\b', '/'),
+    (r'\binteger divide\b', '//'),
+    (r'\bmodulus\b', '%'),
+    (r'\bpower\b', '**'),
+    (r'\bbecomes\b', '='),
+    (r'\btrue\b', 'True'),
+    (r'\bfalse\b', 'False'),
+    (r'\bnothing\b', 'None'),
+]
+
+# Bump when translation changes in a way TRANSLATIONS does not show, so
+# cached code objects from older translators are not reused.
+TRANSLATOR_VERSION = "8"
+
+CACHE_DIR_NAME = "__clcache__"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Minimum compile_cl throughput, parse and bytecode compile together,
+# checked by `python transl.py --check-speed`. The old line-by-line
+# translation followed by compile() managed about 15,000 lines/s on the same
+# sample, where compile_cl runs at about 20,000.
+TARGET_LINES_PER_SECOND = 15_000
+
+# Buffer size used by --buffered-output unless --output-buffer-size is given.
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# How long --timeout waits for an interrupted program to stop before ending
+# the process, and the exit status it ends it with.
+TIMEOUT_GRACE_SECONDS = 2
+TIMEOUT_EXIT_STATUS = 124
+
+# How often --profile samples the running program's stack, and how many
+# rows each table of its report shows.
+PROFILE_INTERVAL = 0.001
+PROFILE_LIMIT = 20
+
+
+def compile_template(template):
+    # Splits a replacement like r'print(\1)' into literals and group numbers
+    # once, since Match.expand re-parses the template on every call.
+    parts = re.split(r'\\(\d+)', template)
+    literals = [re.sub('', part, '') for part in parts[0::2]]
+    groups = [int(group) for group in parts[1::2]]
+
+    def expand(match):
+        pieces = [literals[0]]
+        for group, literal in zip(groups, literals[1:]):
+            pieces.append(match.group(group))
+            pieces.append(literal)
+        return ''.join(pieces)
+
+    return expand
+
+
+def apply_stage(stage, text):
+    if stage is None:
+        return text
+    sub, replace = stage
+    return sub(replace, text)
+
+
+class Translator:
+    # All rules are compiled once into a single alternation, tried in table
+    # order at each position, so a line is rewritten in one regex pass.
+    # Text produced by a rule is run through the rules after it, and text
+    # captured by a rule through the rules before it, which is what the old
+    # one-re.sub-per-rule cascade did. Stage (lo, hi) holds rules lo..hi-1.
+    def __init__(self, translations):
+        self.translations = list(translations)
+        self.stages = {}
+        self.sub, self.replace = self.stage(0, len(self.translations))
+
+    def stage(self, lo, hi):
+        key = (lo, hi)
+        if key not in self.stages:
+            self.stages[key] = self.compile_stage(lo, hi) if lo < hi else None
+        return self.stages[key]
+
+    def compile_stage(self, lo, hi):
+        parts = []
+        leading_words = []
+        replacements = {}
+
+        for index in range(lo, hi):
+            pattern, replacement = self.translations[index]
+            name = f"r{index}"
+            regex = re.compile(pattern)
+            parts.append(f"(?P<{name}>{pattern})")
+            leading_word = re.match(r'\\b(\w+)', pattern)
+            leading_words.append(leading_word and leading_word.group(1))
+            after = self.stage(index + 1, hi)
+            if regex.groups:
+                before = self.stage(lo, index)
+                replacements[name] = (regex, compile_template(replacement), before, after)
+            else:
+                # re.sub on an empty string only expands the template's escapes
+                replacements[name] = apply_stage(after, re.sub('', replacement, ''))
+
+        # Let the engine skip every position that cannot start a rule instead
+        # of trying each alternative there.
+        alternation = "|".join(parts)
+        if all(leading_words):
+            words = "|".join(sorted(set(leading_words)))
+            alternation = rf"\b(?={words})(?:{alternation})"
+
+        def replace(match):
+            replacement = replacements[match.lastgroup]
+            if replacement.__class__ is str:
+                return replacement
+            regex, expand, before, after = replacement
+            text = apply_stage(before, match.group())
+            return apply_stage(after, regex.sub(expand, text))
+
+        return re.compile(alternation).sub, replace
+
+    def translate_line(self, line):
+        return self.sub(self.replace, line)
+
+    def translate(self, cobralang_code):
+        sub, replace = self.sub, self.replace
+        return '\n'.join([sub(replace, line) for line in cobralang_code.splitlines()])
+
+    def translate_lines(self, lines):
+        sub, replace = self.sub, self.replace
+        for line in lines:
+            yield sub(replace, line.rstrip('\r\n'))
+
+
+translator = Translator(TRANSLATIONS)
 
 def cl_to_py(cobralang_code):
-    translations = [
-        (r'\bdefine\b', 'def'),
-        (r'\boutput\s+"(.*?)"', r'print("\1")'),
-        (r'\boutput\s+(.*)', r'print(\1)'),
-        (r'\botherwise\b', 'else:'),
-        (r'\belse if\b', 'elif'),
-        (r'\brepeat (\w+) from (\d+) to (\d+):', r'for \1 in range(\2, \3 + 1):'),
-        (r'\bloop while\b', 'while'),
-        (r'\bexit\b', 'break'),
-        (r'\bskip\b', 'continue'),
-        (r'\bgive\b', 'return'),
-        (r'\bis greater than\b', '>'),
-        (r'\bis less than\b', '<'),
-        (r'\bis equal to\b', '=='),
-        (r'\bis not equal to\b', '!='),
-        (r'\bis at least\b', '>='),
-        (r'\bis at most\b', '<='),
-        (r'\bwithin\b', 'in'),
-        (r'\badd\b', '+'),
-        (r'\bsubtract\b', '-'),
-        (r'\bmultiply\b', '*'),
-        (r'\bdivide\b', '/'),
-        (r'\binteger divide\b', '//'),
-        (r'\bmodulus\b', '%'),
-        (r'\bpower\b', '**'),
-        (r'\bbecomes\b', '='),
-        (r'\btrue\b', 'True'),
-        (r'\bfalse\b', 'False'),
-        (r'\bnothing\b', 'None'),
-    ]
-
-    lines = cobralang_code.splitlines()
-    translated_lines = []
-
-    for line in lines:
-        translated_line = line
-        for pattern, replacement in translations:
-            translated_line = re.sub(pattern, replacement, translated_line)
-        translated_lines.append(translated_line)
-
-    return '\n'.join(translated_lines)
-
-def translate(file_path, debug=False):
-    with open(file_path, 'r') as file:
-        cobralang_code = file.read()
-
-    translated_code = cl_to_py(cobralang_code)
+    # A string is translated whole; any other iterable of lines (such as an
+    # open file) is translated lazily, one line at a time.
+    if isinstance(cobralang_code, str):
+        return translator.translate(cobralang_code)
+    return translator.translate_lines(cobralang_code)
+
+def emit_py(file_path, output=None):
+    if output is None:
+        output = sys.stdout
+    if file_path == "-":
+        source, filename = sys.stdin, "<stdin>"
+    else:
+        source, filename = open(file_path, 'r'), file_path
+    # The same parse cl_to_ast does, one top-level statement at a time, so
+    # the output is what actually runs and is written as it is parsed.
+    with source:
+        parser = Parser(source, filename)
+        transformer = ConcurrencyTransformer(filename)
+        runtime_imported = False
+        for statement in parser.iter_statements():
+            if parser.uses_concurrency:
+                statement = transformer.visit(statement)
+            if parser.uses_runtime and not runtime_imported:
+                output.write(f"import transl as {RUNTIME_MODULE}\n")
+                runtime_imported = True
+            for node in statement if isinstance(statement, list) else [statement]:
+                output.write(ast.unparse(node))
+                output.write('\n')
+
+SPEED_CHECK_SAMPLE = """define score(player, bonus):
+    total becomes player.points multiply 2 add bonus
+    if total is greater than 100 and player.alive is equal to true:
+        output "High score: " + str(total)
+    else if total is at most 0:
+        give nothing
+    otherwise:
+        output player.name + " scored " + str(total)
+    give total
+
+repeat i from 1 to 10:
+    loop while i is less than 5:
+        i becomes i add 1
+        if i modulus 2 is not equal to 0:
+            skip
+"""
+
+def check_speed(line_count=20_000, repeat=5):
+    lines = SPEED_CHECK_SAMPLE.splitlines()
+    sample = "\n".join(lines * (line_count // len(lines) + 1))
+    # The best of a few runs, so one slow run on a busy machine doesn't fail it.
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compile_cl(sample, "<check-speed>")
+        elapsed = min(elapsed, time.perf_counter() - start)
+    lines_per_second = sample.count("\n") / elapsed
+    print(f"compile_cl: {lines_per_second:,.0f} lines/s (target {TARGET_LINES_PER_SECOND:,} lines/s)")
+    return lines_per_second >= TARGET_LINES_PER_SECOND
+
+COMPARISON_PHRASES = [
+    (("is", "not", "equal", "to"), ast.NotEq),
+    (("is", "greater", "than"), ast.Gt),
+    (("is", "less", "than"), ast.Lt),
+    (("is", "equal", "to"), ast.Eq),
+    (("is", "at", "least"), ast.GtE),
+    (("is", "at", "most"), ast.LtE),
+    (("not", "within"), ast.NotIn),
+    (("is", "not"), ast.IsNot),
+    (("within",), ast.In),
+    (("is",), ast.Is),
+]
+
+# Words that can start a comparison, so anything else is turned away early.
+COMPARISON_WORDS = {"in", "not", "is", "within"}
+
+# The phrases by their first two words, in the order above, so only the few
+# that can match are tried. A one-word phrase is keyed by its word and None.
+def phrases_by_start(phrases):
+    table = {}
+    for words, op in phrases:
+        table.setdefault((words[0], words[1] if len(words) > 1 else None), []).append((words, op))
+    return table
+
+PHRASES_BY_START = phrases_by_start(COMPARISON_PHRASES)
+
+# `x is positive` and friends compare against zero and take no right operand.
+SIGN_PHRASES = {"positive": ast.Gt, "negative": ast.Lt, "zero": ast.Eq}
+
+SYMBOL_COMPARISONS = {
+    "<": ast.Lt, ">": ast.Gt, "==": ast.Eq, "!=": ast.NotEq, "<=": ast.LtE, ">=": ast.GtE,
+}
+
+SUM_OPERATORS = {"+": ast.Add, "-": ast.Sub, "add": ast.Add, "subtract": ast.Sub}
+TERM_OPERATORS = {
+    "*": ast.Mult, "/": ast.Div, "//": ast.FloorDiv, "%": ast.Mod, "@": ast.MatMult,
+    "multiply": ast.Mult, "divide": ast.Div, "modulus": ast.Mod,
+}
+BITWISE_OPERATORS = {"|": ast.BitOr, "^": ast.BitXor, "&": ast.BitAnd, "<<": ast.LShift, ">>": ast.RShift}
+BINARY_OPERATORS = {**BITWISE_OPERATORS, **SUM_OPERATORS, **TERM_OPERATORS}
+# How tightly each operator binds, loosest first. `not` is a prefix at its
+# own level, and the comparison words only start a comparison phrase.
+OR_LEVEL, AND_LEVEL, NOT_LEVEL, COMPARISON_LEVEL, BITWISE_OR_LEVEL, SUM_LEVEL, TERM_LEVEL = 1, 2, 3, 4, 5, 9, 10
+OPERATOR_LEVELS = {
+    "or": OR_LEVEL, "and": AND_LEVEL,
+    **dict.fromkeys([*COMPARISON_WORDS, *SYMBOL_COMPARISONS], COMPARISON_LEVEL),
+    "|": BITWISE_OR_LEVEL, "^": 6, "&": 7, "<<": 8, ">>": 8,
+    **dict.fromkeys(SUM_OPERATORS, SUM_LEVEL),
+    **dict.fromkeys([*TERM_OPERATORS, "integer"], TERM_LEVEL),
+}
+UNARY_OPERATORS = {"-": ast.USub, "+": ast.UAdd, "~": ast.Invert}
+AUGMENTED_ASSIGNMENTS = {
+    "+=": ast.Add, "-=": ast.Sub, "*=": ast.Mult, "/=": ast.Div, "//=": ast.FloorDiv, "%=": ast.Mod,
+    "**=": ast.Pow, "@=": ast.MatMult, "&=": ast.BitAnd, "|=": ast.BitOr, "^=": ast.BitXor,
+    "<<=": ast.LShift, ">>=": ast.RShift,
+}
+NAME_FOLLOWERS = frozenset({"=", ".", "[", ",", *AUGMENTED_ASSIGNMENTS})
+CONSTANTS = {"true": True, "false": False, "nothing": None, "True": True, "False": False, "None": None}
+# Values a statement can start with other than an expression statement,
+# checked first so most statements skip the comparisons one by one.
+COMPOUND_STATEMENT_STARTS = frozenset({
+    "@", "define", "def", "remember", "class", "dynamic", "if", "repeat", "for",
+    "while", "loop", "try", "with", "concurrently", "async", "match",
+})
+SIMPLE_STATEMENT_STARTS = frozenset({
+    "pass", "exit", "break", "skip", "continue", "give", "return", "output", "import",
+    "from", "global", "nonlocal", "del", "raise", "yield", "assert",
+})
+LAYOUT_KINDS = frozenset({"NEWLINE", "INDENT", "DEDENT"})
+# Names that are not plain variable names where an expression starts.
+RESERVED_NAMES = frozenset(keyword.kwlist) | CONSTANTS.keys()
+METHOD_NAMES = {"_initialize": "__init__"}
+# Name this module is imported under in programs that use `array from`,
+# `array of`, `sum of`, `repeat in parallel` or `remember define`.
+RUNTIME_MODULE = "_cobralang"
+PARALLEL_BODY_NAME = "_parallel_body"
+CONCURRENT_TASK_NAME = "_concurrent_task"
+CONCURRENT_TASKS_NAME = "_concurrent_tasks"
+# Blocking statements in a `concurrently:` block run on this many threads.
+CONCURRENT_THREADS = 64
+# Results a `remember define` function keeps without `keeping N results`.
+REMEMBER_SIZE = 1024
+# Each worker gets about this many chunks of a `repeat in parallel` loop, so
+# uneven iterations still balance out.
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+
+# Nodes that need an empty type_params on Python versions that have it.
+TYPE_PARAM_NODES = {node_type for node_type in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+                    if "type_params" in node_type._fields}
+
+
+def make_node(node_type, **fields):
+    if node_type in TYPE_PARAM_NODES:
+        fields.setdefault("type_params", [])
+    return node_type(**fields)
+
+
+class Token:
+    __slots__ = ("kind", "value", "line", "column", "end_line", "end_column")
+
+    def __init__(self, kind, value, line, column, end_line, end_column):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.column = column
+        self.end_line = end_line
+        self.end_column = end_column
+
+    def is_word(self, *words):
+        return self.kind == "NAME" and self.value in words
+
+    def is_op(self, *operators):
+        return self.kind == "OP" and self.value in operators
+
+
+def byte_column(text, column):
+    if text.isascii():
+        return column
+    return len(text[:column].encode("utf-8"))
+
+
+def quoted_end(text, index):
+    # Index of the last quote of the string that starts at text[index],
+    # for strings inside f-string fields, which cannot hold backslashes.
+    quote = text[index] * 3 if text.startswith(text[index] * 3, index) else text[index]
+    end = text.find(quote, index + len(quote))
+    return len(text) if end < 0 else end + len(quote) - 1
+
+
+# The tokenizer below is the loop of the stdlib's tokenize module, using its
+# own patterns, fused with what the parser needs: tokens come out as Token
+# objects with the UTF-8 byte columns the ast module uses, and comments and
+# blank lines are dropped on the spot. f-strings are single STRING tokens,
+# whatever the Python version.
+# Plain names and operators are tried before the stdlib alternatives, which
+# match the same spans but try numbers and strings first.
+PSEUDO_TOKEN = re.compile(tokenize.Whitespace + tokenize.group(
+    r"[^\W\d]\w*(?![\w'\"])", r"(?=[^.\w'\"#\\])" + tokenize.Funny,
+    tokenize.PseudoExtras, tokenize.Number, tokenize.Funny, tokenize.ContStr, tokenize.Name), re.UNICODE)
+STRING_ENDS = {start: re.compile(pattern) for start, pattern in tokenize.endpats.items()}
+NUMBER_START = "0123456789"
+# First characters of the tokens that need no further checks: names (a
+# string with a prefix such as r"" ends in a quote instead) and operators
+# other than brackets and dots.
+NAME_START = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+OPERATOR_START = frozenset("+-*/%@&|^~<>=!:;,")
+
+
+def tokenize_cl(lines, filename):
+    pseudo_match = PSEUDO_TOKEN.match
+    triple_quoted = tokenize.triple_quoted
+    single_quoted = tokenize.single_quoted
+    tabsize = tokenize.tabsize
+    line_iterator = iter(lines)
+    number = parens = 0
+    continued = False
+    indents = [0]
+    # A string that runs over several lines: its text so far, the end
+    # pattern to look for, and where it started.
+    string_text = ""
+    string_end = None
+    string_needs_backslash = False
+    string_line = string_column = 0
+    string_first_line = ""
+    last_line = line = ""
+
+    while True:
+        last_line = line
+        line = next(line_iterator, "")
+        number += 1
+        position, length = 0, len(line)
+        ascii = line.isascii()
+
+        if string_text:
+            if not line:
+                raise SyntaxError("EOF in multi-line string",
+                                  (filename, string_line, string_column + 1, string_first_line))
+            end_match = string_end.match(line)
+            if end_match:
+                position = end = end_match.end(0)
+                yield Token("STRING", string_text + line[:end], string_line, string_column,
+                            number, end if ascii else byte_column(line, end))
+                string_text = ""
+            elif string_needs_backslash and line[-2:] != "\\\n" and line[-3:] != "\\\r\n":
+                # A one-quote string only continues over a backslash-newline.
+                raise SyntaxError("unterminated string literal",
+                                  (filename, string_line, string_column + 1, string_first_line))
+            else:
+                string_text += line
+                continue
+
+        elif parens == 0 and not continued:
+            if not line:
+                break
+            position = length - len(line.lstrip(" \t\f"))
+            if position == length:
+                break
+            column = position
+            if "\t" in line[:position] or "\f" in line[:position]:
+                column = 0
+                for character in line[:position]:
+                    if character == " ":
+                        column += 1
+                    elif character == "\t":
+                        column = (column // tabsize + 1) * tabsize
+                    else:
+                        column = 0
+            if line[position] in "#\r\n":
+                continue
+
+            indent_end = position if ascii else byte_column(line, position)
+            if column > indents[-1]:
+                indents.append(column)
+                yield Token("INDENT", line[:position], number, 0, number, indent_end)
+            while column < indents[-1]:
+                if column not in indents:
+                    raise IndentationError("unindent does not match any outer indentation level",
+                                           (filename, number, position, line))
+                indents.pop()
+                yield Token("DEDENT", "", number, indent_end, number, indent_end)
+
+        else:
+            if not line:
+                raise SyntaxError("EOF in multi-line statement", (filename, number, 1, ""))
+            continued = False
+
+        while position < length:
+            match = pseudo_match(line, position)
+            if not match:
+                character = line[position]
+                if not character.isspace():
+                    column = position if ascii else byte_column(line, position)
+                    yield Token("ERRORTOKEN", character, number, column, number, column + len(character.encode()))
+                position += 1
+                continue
+            start, end = match.span(1)
+            position = end
+            if start == end:
+                continue
+            token = line[start:end]
+            initial = token[0]
+            if not ascii:
+                start, end = byte_column(line, start), byte_column(line, end)
+
+            if initial in NAME_START and token[-1] not in "\"'\n":
+                yield Token("NAME", token, number, start, number, end)
+            elif initial in OPERATOR_START:
+                yield Token("OP", token, number, start, number, end)
+            elif initial in NUMBER_START or initial == "." and token != "." and token != "...":
+                yield Token("NUMBER", token, number, start, number, end)
+            elif initial in "\r\n":
+                if not parens:
+                    yield Token("NEWLINE", token, number, start, number, end)
+            elif initial == "#":
+                pass
+            elif token in triple_quoted:
+                string_end = STRING_ENDS[token]
+                end_match = string_end.match(line, position)
+                if end_match:
+                    position = end_match.end(0)
+                    end = position if ascii else byte_column(line, position)
+                    yield Token("STRING", line[match.start(1):position], number, start, number, end)
+                else:
+                    string_text = line[match.start(1):]
+                    string_needs_backslash = False
+                    string_line, string_column, string_first_line = number, start, line
+                    break
+            elif initial in single_quoted or token[:2] in single_quoted or token[:3] in single_quoted:
+                if token[-1] == "\n":
+                    string_end = STRING_ENDS.get(initial) or STRING_ENDS.get(token[1]) or STRING_ENDS.get(token[2])
+                    string_text = line[match.start(1):]
+                    string_needs_backslash = True
+                    string_line, string_column, string_first_line = number, start, line
+                    break
+                yield Token("STRING", token, number, start, number, end)
+            elif initial.isidentifier():
+                yield Token("NAME", token, number, start, number, end)
+            elif initial == "\\":
+                continued = True
+            else:
+                if initial in "([{":
+                    parens += 1
+                elif initial in ")]}":
+                    parens -= 1
+                yield Token("OP", token, number, start, number, end)
+
+    # An implicit NEWLINE when the input does not end in one.
+    if last_line and last_line[-1] not in "\r\n" and not last_line.strip().startswith("#"):
+        column = len(last_line.encode("utf-8"))
+        yield Token("NEWLINE", "", number - 1, column, number - 1, column + 1)
+    for _ in indents[1:]:
+        yield Token("DEDENT", "", number, 0, number, 0)
+    yield Token("ENDMARKER", "", number, 0, number, 0)
+
+
+class Parser:
+    # Recursive-descent parser for CobraLang that builds Python ast nodes
+    # directly, with the .cl line and column on every node.
+    def __init__(self, lines, filename="<cobralang>"):
+        self.filename = filename
+        # The current token is kept in self.token, which is what almost
+        # every check looks at; only the few two-word phrases need to see
+        # further ahead. Tokens are read as the parser gets to them, so
+        # iter_statements() can stream a file of any size.
+        self.tokens = tokenize_cl(lines, filename)
+        self.lookahead = collections.deque()
+        self.token = next(self.tokens)
+        self.previous = None
+        self.uses_runtime = False
+        self.uses_concurrency = False
+
+    def peek(self, distance=0):
+        if not distance:
+            return self.token
+        lookahead = self.lookahead
+        while len(lookahead) < distance:
+            # Past the end, the ENDMARKER repeats.
+            lookahead.append(next(self.tokens, lookahead[-1] if lookahead else self.token))
+        return lookahead[distance - 1]
+
+    def advance(self):
+        token = self.token
+        if token.kind not in LAYOUT_KINDS:
+            # Nodes end where their last token does, so a compound statement
+            # ends with its body rather than at the NEWLINE or DEDENT after it.
+            self.previous = token
+        self.token = self.lookahead.popleft() if self.lookahead else next(self.tokens, token)
+        return token
+
+    # Only NAME tokens can have a word as their value, so words are checked
+    # by value alone.
+
+    def at_words(self, first, *rest):
+        if self.token.value != first:
+            return False
+        for index, word in enumerate(rest, 1):
+            if self.peek(index).value != word:
+                return False
+        return True
+
+    def accept_words(self, *words):
+        if self.at_words(*words):
+            for _ in words:
+                self.advance()
+            return True
+        return False
+
+    def accept_op(self, *operators):
+        token = self.token
+        if token.kind == "OP" and token.value in operators:
+            return self.advance()
+        return None
+
+    def at_end_of_statement(self, distance=0):
+        token = self.peek(distance)
+        return token.kind in ("NEWLINE", "ENDMARKER") or token.is_op(";")
+
+    def error(self, message, token=None):
+        token = token or self.token
+        raise SyntaxError(message, (self.filename, token.line, token.column + 1, None))
+
+    def expect_op(self, op):
+        token = self.accept_op(op)
+        if token is None:
+            self.error(f"expected '{op}'")
+        return token
+
+    def expect_kind(self, kind):
+        if self.token.kind != kind:
+            self.error(f"expected {kind.lower()}")
+        return self.advance()
+
+    def expect_name(self):
+        if keyword.iskeyword(self.token.value):
+            self.error("invalid syntax")
+        return self.expect_kind("NAME").value
+
+    def located(self, node, start):
+        node.lineno = start.line
+        node.col_offset = start.column
+        node.end_lineno = self.previous.end_line
+        node.end_col_offset = self.previous.end_column
+        return node
+
+    def node(self, node_type, start, **fields):
+        # make_node and located in one, since this runs for every node.
+        if node_type in TYPE_PARAM_NODES:
+            fields.setdefault("type_params", [])
+        node = node_type(**fields)
+        previous = self.previous
+        node.lineno = start.line
+        node.col_offset = start.column
+        node.end_lineno = previous.end_line
+        node.end_col_offset = previous.end_column
+        return node
+
+    # Statements
+
+    def parse_module(self):
+        return ast.Module(body=list(self.iter_statements()), type_ignores=[])
+
+    def iter_statements(self):
+        while self.token.kind != "ENDMARKER":
+            yield from self.statement()
+
+    def statement(self):
+        token = self.token
+        if token.value not in COMPOUND_STATEMENT_STARTS or self.at_plain_name():
+            if token.kind == "INDENT":
+                self.error("unexpected indent")
+            return self.simple_statements()
+        if token.is_op("@"):
+            return [self.decorated()]
+        if token.is_word("define", "def") or self.at_remember():
+            return [self.function_def([])]
+        if token.is_word("class") or self.at_words("dynamic", "class"):
+            return [self.class_def([])]
+        if token.is_word("if"):
+            return [self.if_statement()]
+        if token.is_word("repeat"):
+            statement = self.repeat_statement()
+            return statement if isinstance(statement, list) else [statement]
+        if token.is_word("for"):
+            return [self.for_statement()]
+        if token.is_word("while") or self.at_words("loop", "while"):
+            return [self.while_statement()]
+        if token.is_word("try"):
+            return [self.try_statement()]
+        if token.is_word("with"):
+            return [self.with_statement()]
+        if token.is_word("async"):
+            return [self.async_statement()]
+        if token.is_word("match") and self.at_match_statement():
+            return [self.match_statement()]
+        if token.is_word("concurrently") and self.peek(1).is_op(":"):
+            self.advance()
+            self.uses_runtime = self.uses_concurrency = True
+            return [self.node(Concurrently, token, body=self.block())]
+        return self.simple_statements()
+
+    def at_plain_name(self):
+        # CobraLang's statement words that Python does not reserve, such as
+        # `output` or `repeat`, are plain names when assigned to, annotated,
+        # called or followed by `.` or `[`.
+        following = self.peek(1)
+        if following.kind != "OP" or self.token.kind != "NAME" or keyword.iskeyword(self.token.value):
+            return False
+        if following.value == "(":
+            # No compound statement goes on with `(`, but `match (x):` can.
+            return self.token.value in COMPOUND_STATEMENT_STARTS and self.token.value != "match"
+        if following.value == ":":
+            # Compound statements open their block with `:`, so only the
+            # simple statement words take an annotation.
+            return self.token.value not in COMPOUND_STATEMENT_STARTS
+        return following.value in NAME_FOLLOWERS
+
+    def simple_statements(self):
+        statements = [self.small_statement()]
+        while self.accept_op(";"):
+            if self.token.kind == "NEWLINE":
+                break
+            statements.append(self.small_statement())
+        if self.token.kind != "ENDMARKER":
+            self.expect_kind("NEWLINE")
+        return statements
+
+    def block(self):
+        self.expect_op(":")
+        if self.token.kind != "NEWLINE":
+            return self.simple_statements()
+        self.advance()
+        if self.token.kind != "INDENT":
+            self.error("expected an indented block")
+        self.advance()
+        body = []
+        while self.token.kind not in ("DEDENT", "ENDMARKER"):
+            body.extend(self.statement())
+        if self.token.kind == "DEDENT":
+            self.advance()
+        return body
+
+    def small_statement(self):
+        start = self.token
+        if start.value not in SIMPLE_STATEMENT_STARTS or self.at_plain_name():
+            return self.expression_statement()
+        if start.is_word("pass"):
+            self.advance()
+            return self.node(ast.Pass, start)
+        if start.is_word("exit", "break") and self.at_end_of_statement(1):
+            self.advance()
+            return self.node(ast.Break, start)
+        if start.is_word("skip", "continue") and self.at_end_of_statement(1):
+            self.advance()
+            return self.node(ast.Continue, start)
+        if start.is_word("give", "return"):
+            self.advance()
+            value = None if self.at_end_of_statement() else self.star_expressions()
+            return self.node(ast.Return, start, value=value)
+        if start.is_word("output"):
+            return self.output_statement()
+        if start.is_word("import"):
+            return self.import_statement()
+        if start.is_word("from"):
+            return self.from_import_statement()
+        if start.is_word("global", "nonlocal"):
+            self.advance()
+            names = [self.expect_name()]
+            while self.accept_op(","):
+                names.append(self.expect_name())
+            node_type = ast.Global if start.value == "global" else ast.Nonlocal
+            return self.node(node_type, start, names=names)
+        if start.is_word("del"):
+            self.advance()
+            targets = [self.as_target(target, ast.Del()) for target in self.target_list()]
+            return self.node(ast.Delete, start, targets=targets)
+        if start.is_word("raise"):
+            self.advance()
+            exception = cause = None
+            if not self.at_end_of_statement():
+                exception = self.expression()
+                if self.accept_words("from"):
+                    cause = self.expression()
+            return self.node(ast.Raise, start, exc=exception, cause=cause)
+        if start.is_word("yield"):
+            return self.node(ast.Expr, start, value=self.yield_expression())
+        if start.is_word("assert"):
+            self.advance()
+            test = self.expression()
+            message = self.expression() if self.accept_op(",") else None
+            return self.node(ast.Assert, start, test=test, msg=message)
+        return self.expression_statement()
+
+    def output_statement(self):
+        start = self.advance()
+        function = self.node(ast.Name, start, id="print", ctx=ast.Load())
+        args, keywords = ([], []) if self.at_end_of_statement() else self.call_arguments(None)
+        call = self.node(ast.Call, start, func=function, args=args, keywords=keywords)
+        return self.node(ast.Expr, start, value=call)
+
+    def import_statement(self):
+        start = self.advance()
+        names = [self.import_alias(dotted=True)]
+        while self.accept_op(","):
+            names.append(self.import_alias(dotted=True))
+        return self.node(ast.Import, start, names=names)
+
+    def from_import_statement(self):
+        start = self.advance()
+        level = 0
+        while self.token.is_op(".", "..."):
+            level += len(self.advance().value)
+        module = None if self.token.is_word("import") else self.dotted_name()
+        if not self.accept_words("import"):
+            self.error("expected 'import'")
+        if self.accept_op("*"):
+            names = [self.node(ast.alias, self.previous, name="*", asname=None)]
+        else:
+            parenthesized = self.accept_op("(")
+            names = [self.import_alias(dotted=False)]
+            while self.accept_op(","):
+                if parenthesized and self.token.is_op(")"):
+                    break
+                names.append(self.import_alias(dotted=False))
+            if parenthesized:
+                self.expect_op(")")
+        return self.node(ast.ImportFrom, start, module=module, names=names, level=level)
+
+    def dotted_name(self):
+        parts = [self.expect_name()]
+        while self.accept_op("."):
+            parts.append(self.expect_name())
+        return ".".join(parts)
+
+    def import_alias(self, dotted):
+        start = self.token
+        name = self.dotted_name() if dotted else self.expect_name()
+        asname = self.expect_name() if self.accept_words("as") else None
+        return self.node(ast.alias, start, name=name, asname=asname)
+
+    def expression_statement(self):
+        start = self.token
+        first = self.star_expressions()
+
+        if self.token.is_word("append"):
+            # `items append x` reads as an instruction: items.append(x)
+            self.advance()
+            value = self.expression()
+            method = self.node(ast.Attribute, start, value=first, attr="append", ctx=ast.Load())
+            call = self.node(ast.Call, start, func=method, args=[value], keywords=[])
+            return self.node(ast.Expr, start, value=call)
+
+        if self.token.is_word("becomes") or self.token.is_op("="):
+            targets = [first]
+            while self.token.is_word("becomes") or self.token.is_op("="):
+                self.advance()
+                targets.append(self.star_expressions())
+            value = targets.pop()
+            targets = [self.as_target(target, ast.Store()) for target in targets]
+            return self.node(ast.Assign, start, targets=targets, value=value)
+
+        if self.token.kind == "OP" and self.token.value in AUGMENTED_ASSIGNMENTS:
+            op = AUGMENTED_ASSIGNMENTS[self.advance().value]
+            value = self.star_expressions()
+            target = self.as_target(first, ast.Store())
+            return self.node(ast.AugAssign, start, target=target, op=op(), value=value)
+
+        if self.token.is_op(":") and isinstance(first, (ast.Name, ast.Attribute, ast.Subscript)):
+            self.advance()
+            annotation = self.expression()
+            value = None
+            if self.token.is_word("becomes") or self.accept_op("="):
+                if self.token.is_word("becomes"):
+                    self.advance()
+                value = self.star_expressions()
+            target = self.as_target(first, ast.Store())
+            return self.node(ast.AnnAssign, start, target=target, annotation=annotation, value=value,
+                             simple=int(isinstance(first, ast.Name) and not start.is_op("(")))
+
+        # `health subtract amount` on its own line updates health in place.
+        if (isinstance(first, ast.BinOp) and getattr(first, "word_operator", False)
+                and isinstance(first.left, (ast.Name, ast.Attribute, ast.Subscript))):
+            target = self.as_target(first.left, ast.Store())
+            return self.node(ast.AugAssign, start, target=target, op=first.op, value=first.right)
+
+        return self.node(ast.Expr, start, value=first)
+
+    def as_target(self, node, context):
+        if isinstance(node, (ast.Name, ast.Attribute, ast.Subscript)):
+            node.ctx = context
+        elif isinstance(node, (ast.Tuple, ast.List)):
+            node.ctx = context
+            for element in node.elts:
+                self.as_target(element, context)
+        elif isinstance(node, ast.Starred) and not isinstance(context, ast.Del):
+            node.ctx = context
+            self.as_target(node.value, context)
+        else:
+            raise SyntaxError("cannot assign to expression",
+                              (self.filename, node.lineno, node.col_offset + 1, None))
+        return node
+
+    def decorated(self):
+        decorators = []
+        while self.accept_op("@"):
+            decorators.append(self.named_expression())
+            self.expect_kind("NEWLINE")
+        if self.token.is_word("define", "def", "async") or self.at_remember():
+            return self.function_def(decorators)
+        if self.token.is_word("class") or self.at_words("dynamic", "class"):
+            return self.class_def(decorators)
+        self.error("expected 'define' or 'class' after a decorator")
+
+    def at_remember(self):
+        return self.at_words("remember", "define") or self.at_words("remember", "def")
+
+    def function_def(self, decorators):
+        start = self.advance()
+        is_async = start.is_word("async")
+        if is_async:
+            if not self.token.is_word("define", "def"):
+                self.error("expected 'define' after 'async'")
+            self.advance()
+        remember = start.is_word("remember")
+        if remember:
+            self.advance()
+        name = self.expect_name()
+        name = METHOD_NAMES.get(name, name)
+        self.expect_op("(")
+        arguments = self.parameters(")", annotations=True)
+        self.expect_op(")")
+        returns = self.expression() if self.accept_op("->") else None
+        if remember:
+            # `remember define f(x) keeping 500 results:` wraps f in a
+            # bounded LRU cache, innermost of its decorators.
+            size = []
+            if self.accept_words("keeping"):
+                size.append(self.expression())
+                if not (self.accept_words("results") or self.accept_words("result")):
+                    self.error("expected 'results'")
+            decorators = decorators + [self.runtime_call("remember", start, size)]
+        body = self.block()
+        node_type = ast.AsyncFunctionDef if is_async else ast.FunctionDef
+        return self.node(node_type, start, name=name, args=arguments, body=body,
+                         decorator_list=decorators, returns=returns)
+
+    def parameters(self, closing, annotations):
+        posonlyargs, args, defaults = [], [], []
+        kwonlyargs, kw_defaults = [], []
+        vararg = kwarg = None
+        keyword_only = False
+
+        while not self.token.is_op(closing):
+            if self.accept_op("/"):
+                posonlyargs, args = args, []
+            elif self.accept_op("**"):
+                kwarg = self.parameter(annotations)
+            elif self.accept_op("*"):
+                keyword_only = True
+                if self.token.kind == "NAME":
+                    vararg = self.parameter(annotations, starred=True)
+            else:
+                argument = self.parameter(annotations)
+                default = None
+                if self.token.is_word("becomes") or self.token.is_op("="):
+                    self.advance()
+                    default = self.expression()
+                if keyword_only:
+                    kwonlyargs.append(argument)
+                    kw_defaults.append(default)
+                else:
+                    if default is None and defaults:
+                        self.error("non-default argument follows default argument")
+                    args.append(argument)
+                    if default is not None:
+                        defaults.append(default)
+            if not self.accept_op(","):
+                break
+
+        return ast.arguments(posonlyargs=posonlyargs, args=args, vararg=vararg, kwonlyargs=kwonlyargs,
+                             kw_defaults=kw_defaults, kwarg=kwarg, defaults=defaults)
+
+    def parameter(self, annotations, starred=False):
+        start = self.token
+        name = self.expect_name()
+        annotation = None
+        if annotations and self.accept_op(":"):
+            # `*args: *Ts` unpacks a type variable tuple.
+            annotation = self.star_or(self.expression) if starred else self.expression()
+        return self.node(ast.arg, start, arg=name, annotation=annotation)
+
+    def class_def(self, decorators):
+        start = self.advance()
+        dynamic = start.is_word("dynamic")
+        if dynamic:
+            self.advance()
+        name = self.expect_name()
+        header_args, header_keywords = [], []
+        if self.accept_op("("):
+            header_args, header_keywords = self.call_arguments(")")
+            self.expect_op(")")
+        body = self.block()
+        node = self.node(ast.ClassDef, start, name=name, bases=header_args, keywords=header_keywords,
+                         body=body, decorator_list=decorators)
+        return ClassBuilder(self).build(node, dynamic)
+
+    def if_statement(self):
+        start = self.advance()
+        test = self.named_expression()
+        body = self.block()
+        orelse = []
+        if self.token.is_word("elif") or self.at_words("else", "if"):
+            orelse = [self.if_statement_tail()]
+        elif self.else_block_follows():
+            orelse = self.else_block()
+        return self.node(ast.If, start, test=test, body=body, orelse=orelse)
+
+    def if_statement_tail(self):
+        start = self.token
+        if not self.accept_words("elif"):
+            self.accept_words("else", "if")
+        test = self.named_expression()
+        body = self.block()
+        orelse = []
+        if self.token.is_word("elif") or self.at_words("else", "if"):
+            orelse = [self.if_statement_tail()]
+        elif self.else_block_follows():
+            orelse = self.else_block()
+        return self.node(ast.If, start, test=test, body=body, orelse=orelse)
+
+    def else_block_follows(self):
+        return self.token.is_word("otherwise", "else") and self.peek(1).is_op(":")
+
+    def else_block(self):
+        self.advance()
+        return self.block()
+
+    def repeat_statement(self):
+        start = self.advance()
+        if self.accept_words("in", "parallel"):
+            return self.parallel_repeat_statement(start)
+        target_token = self.token
+        target = self.node(ast.Name, target_token, id=self.expect_name(), ctx=ast.Store())
+        if not self.accept_words("from"):
+            self.error("expected 'from'")
+        first = self.expression()
+        if not self.accept_words("to"):
+            self.error("expected 'to'")
+        last = self.expression()
+        # `to` is inclusive, so the range stops one past the last value.
+        one = ast.copy_location(ast.Constant(value=1), last)
+        stop = ast.copy_location(ast.BinOp(left=last, op=ast.Add(), right=one), last)
+        function = self.node(ast.Name, start, id="range", ctx=ast.Load())
+        iterator = self.node(ast.Call, start, func=function, args=[first, stop], keywords=[])
+        body = self.block()
+        return self.node(ast.For, start, target=target, iter=iterator, body=body, orelse=[])
+
+    def parallel_repeat_statement(self, start):
+        # `repeat in parallel i from A to B using N workers into results:`
+        # turns the body into a function of i, which parallel_repeat runs
+        # across a process pool. Each iteration's `give` value lands in
+        # results, in order.
+        target_token = self.token
+        target = self.node(ast.arg, target_token, arg=self.expect_name(), annotation=None)
+        if not self.accept_words("from"):
+            self.error("expected 'from'")
+        first = self.expression()
+        if not self.accept_words("to"):
+            self.error("expected 'to'")
+        last = self.expression()
+        one = ast.copy_location(ast.Constant(value=1), last)
+        stop = ast.copy_location(ast.BinOp(left=last, op=ast.Add(), right=one), last)
+        workers = ast.copy_location(ast.Constant(value=None), last)
+        if self.accept_words("using"):
+            workers = self.expression()
+            if not (self.accept_words("workers") or self.accept_words("worker")):
+                self.error("expected 'workers'")
+        result = None
+        if self.accept_words("into"):
+            result_token = self.token
+            result = self.node(ast.Name, result_token, id=self.expect_name(), ctx=ast.Store())
+        body = ParallelBodyChecker(self).visit_body(self.block())
+        arguments = ast.arguments(posonlyargs=[], args=[target], vararg=None, kwonlyargs=[],
+                                  kw_defaults=[], kwarg=None, defaults=[])
+        function = self.node(ast.FunctionDef, start, name=PARALLEL_BODY_NAME, args=arguments, body=body,
+                             decorator_list=[], returns=None)
+        reference = self.node(ast.Name, start, id=PARALLEL_BODY_NAME, ctx=ast.Load())
+        call = self.runtime_call("parallel_repeat", start, [reference, first, stop, workers])
+        if result is None:
+            return [function, self.node(ast.Expr, start, value=call)]
+        return [function, self.node(ast.Assign, start, targets=[result], value=call)]
+
+    def async_statement(self):
+        following = self.peek(1)
+        if following.is_word("define", "def"):
+            return self.function_def([])
+        if following.is_word("for"):
+            return self.for_statement()
+        if following.is_word("with"):
+            return self.with_statement()
+        self.error("expected 'define', 'for' or 'with' after 'async'")
+
+    def for_statement(self):
+        start = self.advance()
+        is_async = start.is_word("async")
+        if is_async:
+            self.advance()
+        target = self.target_expression()
+        if not (self.accept_words("in") or self.accept_words("within")):
+            self.error("expected 'in' or 'within'")
+        iterator = self.star_expressions()
+        body = self.block()
+        orelse = self.else_block() if self.else_block_follows() else []
+        node_type = ast.AsyncFor if is_async else ast.For
+        return self.node(node_type, start, target=target, iter=iterator, body=body, orelse=orelse)
+
+    def while_statement(self):
+        start = self.advance()
+        if start.is_word("loop"):
+            self.advance()
+        test = self.named_expression()
+        body = self.block()
+        orelse = self.else_block() if self.else_block_follows() else []
+        return self.node(ast.While, start, test=test, body=body, orelse=orelse)
+
+    def try_statement(self):
+        start = self.advance()
+        body = self.block()
+        handlers = []
+        star = None
+        while self.token.is_word("except"):
+            handler_start = self.advance()
+            # `except*` handles the matching part of an exception group.
+            is_star = self.accept_op("*") is not None
+            if star is not None and is_star != star:
+                self.error("cannot have both 'except' and 'except*' on the same 'try'", handler_start)
+            star = is_star
+            if is_star and self.token.is_op(":"):
+                self.error("expected one or more exception types")
+            exception_type = name = None
+            if not self.token.is_op(":"):
+                exception_type = self.expression()
+                if self.accept_words("as"):
+                    name = self.expect_name()
+            handler_body = self.block()
+            handlers.append(self.node(ast.ExceptHandler, handler_start, type=exception_type,
+                                      name=name, body=handler_body))
+        orelse = self.else_block() if handlers and self.else_block_follows() else []
+        finalbody = []
+        if self.token.is_word("finally"):
+            self.advance()
+            finalbody = self.block()
+        if not handlers and not finalbody:
+            self.error("expected 'except' or 'finally' block")
+        node_type = ast.TryStar if star else ast.Try
+        return self.node(node_type, start, body=body, handlers=handlers, orelse=orelse, finalbody=finalbody)
+
+    def with_statement(self):
+        start = self.advance()
+        is_async = start.is_word("async")
+        if is_async:
+            self.advance()
+        parenthesized = self.at_parenthesized_items() and self.advance()
+        items = []
+        while not (parenthesized and self.token.is_op(")")):
+            context = self.expression()
+            # The target is a single one; a comma starts the next item.
+            target = self.as_target(self.bitwise_or(), ast.Store()) if self.accept_words("as") else None
+            items.append(ast.withitem(context_expr=context, optional_vars=target))
+            if not self.accept_op(","):
+                break
+        if parenthesized:
+            self.expect_op(")")
+        body = self.block()
+        node_type = ast.AsyncWith if is_async else ast.With
+        return self.node(node_type, start, items=items, body=body)
+
+    def at_parenthesized_items(self):
+        # `with (a as x, b as y):` puts its items in brackets, and brackets
+        # that close right before the colon hold items rather than a tuple.
+        if not self.token.is_op("("):
+            return False
+        depth = distance = 0
+        while True:
+            token = self.peek(distance)
+            if token.kind in ("NEWLINE", "ENDMARKER"):
+                return False
+            if token.kind == "OP" and token.value in ("(", "[", "{"):
+                depth += 1
+            elif token.kind == "OP" and token.value in (")", "]", "}"):
+                depth -= 1
+                if not depth:
+                    return self.peek(distance + 1).is_op(":")
+            distance += 1
+
+    # `match` and `case` are only keywords at the start of a match statement
+    # and its cases, as in Python. Patterns are Python's; guards and bodies
+    # are CobraLang.
+
+    def at_match_statement(self):
+        # A statement starting with `match` is a match statement when its
+        # line ends in a colon that opens an indented block.
+        distance = 1
+        while self.peek(distance).kind not in ("NEWLINE", "ENDMARKER"):
+            distance += 1
+        return distance > 2 and self.peek(distance - 1).is_op(":") and self.peek(distance + 1).kind == "INDENT"
+
+    def match_statement(self):
+        start = self.advance()
+        subject = self.star_expressions()
+        self.expect_op(":")
+        self.expect_kind("NEWLINE")
+        self.expect_kind("INDENT")
+        cases = []
+        while self.token.kind not in ("DEDENT", "ENDMARKER"):
+            if not self.token.is_word("case"):
+                self.error("expected 'case'")
+            self.advance()
+            pattern = self.patterns()
+            guard = self.named_expression() if self.accept_words("if") else None
+            cases.append(ast.match_case(pattern=pattern, guard=guard, body=self.block()))
+        if self.token.kind == "DEDENT":
+            self.advance()
+        return self.node(ast.Match, start, subject=subject, cases=cases)
+
+    def patterns(self):
+        start = self.token
+        pattern = self.star_pattern()
+        if not self.token.is_op(","):
+            return pattern
+        patterns = [pattern]
+        while self.accept_op(","):
+            if self.token.is_op(":") or self.token.is_word("if"):
+                break
+            patterns.append(self.star_pattern())
+        return self.node(ast.MatchSequence, start, patterns=patterns)
+
+    def star_pattern(self):
+        start = self.token
+        if not self.accept_op("*"):
+            return self.pattern()
+        name = self.expect_name()
+        return self.node(ast.MatchStar, start, name=None if name == "_" else name)
+
+    def pattern(self):
+        start = self.token
+        patterns = [self.closed_pattern()]
+        while self.accept_op("|"):
+            patterns.append(self.closed_pattern())
+        pattern = patterns[0] if len(patterns) == 1 else self.node(ast.MatchOr, start, patterns=patterns)
+        if not self.accept_words("as"):
+            return pattern
+        name = self.expect_name()
+        if name == "_":
+            self.error("cannot use '_' as a target")
+        return self.node(ast.MatchAs, start, pattern=pattern, name=name)
+
+    def closed_pattern(self):
+        start = self.token
+        if start.kind == "NAME" and start.value in CONSTANTS:
+            self.advance()
+            return self.node(ast.MatchSingleton, start, value=CONSTANTS[start.value])
+        if start.kind in ("NUMBER", "STRING") or start.is_op("-"):
+            return self.node(ast.MatchValue, start, value=self.literal_pattern_value())
+        if start.kind == "NAME":
+            name = self.expect_name()
+            if not self.token.is_op(".", "("):
+                return self.node(ast.MatchAs, start, pattern=None, name=None if name == "_" else name)
+            value = self.node(ast.Name, start, id=name, ctx=ast.Load())
+            while self.accept_op("."):
+                value = self.node(ast.Attribute, start, value=value, attr=self.expect_name(), ctx=ast.Load())
+            if self.accept_op("("):
+                return self.class_pattern(start, value)
+            return self.node(ast.MatchValue, start, value=value)
+        if self.accept_op("(", "["):
+            closing = ")" if self.previous.value == "(" else "]"
+            patterns = []
+            while not self.token.is_op(closing):
+                patterns.append(self.star_pattern())
+                if not self.accept_op(","):
+                    break
+            self.expect_op(closing)
+            if closing == ")" and len(patterns) == 1 and not self.previous.is_op(",") \
+                    and not isinstance(patterns[0], ast.MatchStar):
+                # Brackets around one pattern only group it.
+                return patterns[0]
+            return self.node(ast.MatchSequence, start, patterns=patterns)
+        if self.accept_op("{"):
+            return self.mapping_pattern(start)
+        self.error("invalid pattern")
+
+    def literal_pattern_value(self):
+        # Strings, numbers with an optional sign, and complex numbers
+        # written as a sum or difference, e.g. `-1 + 2j`.
+        start = self.token
+        if start.kind == "STRING":
+            value = self.strings()
+            if not isinstance(value, ast.Constant):
+                self.error("patterns may only match literals and attribute lookups", start)
+            return value
+        value = self.signed_number()
+        if self.token.is_op("+", "-"):
+            op = ast.Add() if self.advance().value == "+" else ast.Sub()
+            number = self.token
+            right = self.atom() if number.kind == "NUMBER" else None
+            if right is None or not isinstance(right.value, complex):
+                self.error("imaginary number required in complex literal", number)
+            value = self.node(ast.BinOp, start, left=value, op=op, right=right)
+        return value
+
+    def signed_number(self):
+        start = self.token
+        negative = self.accept_op("-")
+        if self.token.kind != "NUMBER":
+            self.error("invalid pattern")
+        number = self.atom()
+        if negative:
+            return self.node(ast.UnaryOp, start, op=ast.USub(), operand=number)
+        return number
+
+    def class_pattern(self, start, cls):
+        patterns, attributes, keyword_patterns = [], [], []
+        while not self.token.is_op(")"):
+            if self.token.kind == "NAME" and self.peek(1).is_op("="):
+                attributes.append(self.advance().value)
+                self.advance()
+                keyword_patterns.append(self.pattern())
+            elif attributes:
+                self.error("positional patterns follow keyword patterns")
+            else:
+                patterns.append(self.pattern())
+            if not self.accept_op(","):
+                break
+        self.expect_op(")")
+        return self.node(ast.MatchClass, start, cls=cls, patterns=patterns, kwd_attrs=attributes,
+                         kwd_patterns=keyword_patterns)
+
+    def mapping_pattern(self, start):
+        keys, patterns, rest = [], [], None
+        while not self.token.is_op("}"):
+            if self.accept_op("**"):
+                rest = self.expect_name()
+                self.accept_op(",")
+                break
+            key = self.token
+            if key.kind == "NAME" and key.value in CONSTANTS:
+                self.advance()
+                keys.append(self.node(ast.Constant, key, value=CONSTANTS[key.value]))
+            elif key.kind == "NAME":
+                value = self.node(ast.Name, key, id=self.expect_name(), ctx=ast.Load())
+                if not self.token.is_op("."):
+                    self.error("mapping pattern keys may only match literals and attribute lookups", key)
+                while self.accept_op("."):
+                    value = self.node(ast.Attribute, key, value=value, attr=self.expect_name(), ctx=ast.Load())
+                keys.append(value)
+            else:
+                keys.append(self.literal_pattern_value())
+            self.expect_op(":")
+            patterns.append(self.pattern())
+            if not self.accept_op(","):
+                break
+        self.expect_op("}")
+        return self.node(ast.MatchMapping, start, keys=keys, patterns=patterns, rest=rest)
+
+    # Expressions
+
+    def target_expression(self):
+        # Loop and `with` targets stop before `in`/`within`, so they are
+        # parsed below the comparison level.
+        start = self.token
+        targets = [self.star_or(self.bitwise_or)]
+        while self.accept_op(","):
+            if self.token.is_word("in", "within") or self.token.is_op(":"):
+                break
+            targets.append(self.star_or(self.bitwise_or))
+        if len(targets) == 1 and not self.previous.is_op(","):
+            return self.as_target(targets[0], ast.Store())
+        return self.as_target(self.node(ast.Tuple, start, elts=targets, ctx=ast.Store()), ast.Store())
+
+    def target_list(self):
+        targets = [self.bitwise_or()]
+        while self.accept_op(","):
+            if self.at_end_of_statement():
+                break
+            targets.append(self.bitwise_or())
+        return targets
+
+    def star_or(self, parse):
+        start = self.token
+        if self.accept_op("*"):
+            return self.node(ast.Starred, start, value=self.bitwise_or(), ctx=ast.Load())
+        return parse()
+
+    def star_expressions(self):
+        start = self.token
+        first = self.star_or(self.expression)
+        if not self.token.is_op(","):
+            return first
+        elements = [first]
+        while self.accept_op(","):
+            if self.at_end_of_statement() or self.token.is_word("becomes") or self.token.is_op("=", ":", ")"):
+                break
+            elements.append(self.star_or(self.expression))
+        return self.node(ast.Tuple, start, elts=elements, ctx=ast.Load())
+
+    def named_expression(self):
+        start = self.token
+        if start.kind == "NAME" and self.peek(1).is_op(":="):
+            self.advance()
+            target = self.node(ast.Name, start, id=start.value, ctx=ast.Store())
+            self.advance()
+            return self.node(ast.NamedExpr, start, target=target, value=self.expression())
+        return self.expression()
+
+    def expression(self):
+        start = self.token
+        if start.value == "lambda" and start.kind == "NAME":
+            self.advance()
+            arguments = self.parameters(":", annotations=False)
+            self.expect_op(":")
+            return self.node(ast.Lambda, start, args=arguments, body=self.expression())
+        body = self.operation(OR_LEVEL)
+        if self.token.value == "if" and self.token.kind == "NAME":
+            self.advance()
+            test = self.operation(OR_LEVEL)
+            if not (self.accept_words("else") or self.accept_words("otherwise")):
+                self.error("expected 'else' or 'otherwise'")
+            return self.node(ast.IfExp, start, test=test, body=body, orelse=self.expression())
+        return body
+
+    def disjunction(self):
+        return self.operation(OR_LEVEL)
+
+    def bitwise_or(self):
+        return self.operation(BITWISE_OR_LEVEL)
+
+    def operation(self, level):
+        # Every binary level from `or` down to multiplication in one loop,
+        # by precedence climbing: the loop takes the operators that bind at
+        # least as tightly as level, and parses the right operand of each one
+        # level tighter still. After most operands the next token is no
+        # operator at all, which takes one lookup to see.
+        start = self.token
+        if start.value == "not" and level <= NOT_LEVEL and start.kind == "NAME":
+            self.advance()
+            left = self.node(ast.UnaryOp, start, op=ast.Not(), operand=self.operation(NOT_LEVEL))
+        else:
+            left = self.factor()
+        while True:
+            operator_level = OPERATOR_LEVELS.get(self.token.value, 0)
+            if operator_level < level:
+                return left
+            if operator_level >= BITWISE_OR_LEVEL:
+                op, word = self.binary_operator()
+                if op is None:
+                    return left
+                right = self.operation(operator_level + 1)
+                left = self.node(ast.BinOp, start, left=left, op=op(), right=right)
+                if operator_level >= SUM_LEVEL:
+                    left.word_operator = word
+            elif operator_level == COMPARISON_LEVEL:
+                comparison = self.comparison(start, left)
+                if comparison is left:
+                    return left
+                left = comparison
+            else:
+                word = self.token.value
+                values = [left]
+                while self.accept_words(word):
+                    values.append(self.operation(operator_level + 1))
+                op = ast.Or() if word == "or" else ast.And()
+                left = self.node(ast.BoolOp, start, op=op, values=values)
+
+    def comparison_operator(self):
+        token = self.token
+        if token.kind == "OP":
+            if token.value in SYMBOL_COMPARISONS:
+                self.advance()
+                return SYMBOL_COMPARISONS[token.value], False
+            return None, False
+        if token.value not in COMPARISON_WORDS or token.kind != "NAME":
+            return None, False
+        if token.value == "in":
+            self.advance()
+            return ast.In, False
+        if self.at_words("not", "in"):
+            self.advance()
+            self.advance()
+            return ast.NotIn, False
+        following = self.peek(1)
+        if token.value == "is" and following.kind == "NAME" and following.value in SIGN_PHRASES:
+            self.advance()
+            return SIGN_PHRASES[self.advance().value], True
+        for start in ((token.value, following.value), (token.value, None)):
+            for words, op in PHRASES_BY_START.get(start, ()):
+                if self.accept_words(*words):
+                    return op, False
+        return None, False
+
+    def comparison(self, start, left):
+        operators, comparators = [], []
+        while True:
+            op, against_zero = self.comparison_operator()
+            if op is None:
+                break
+            operators.append(op())
+            if against_zero:
+                comparators.append(self.located(ast.Constant(value=0), self.previous))
+            else:
+                comparators.append(self.operation(BITWISE_OR_LEVEL))
+        if not operators:
+            return left
+        return self.node(ast.Compare, start, left=left, ops=operators, comparators=comparators)
+
+    def binary_operator(self):
+        token = self.token
+        op = BINARY_OPERATORS.get(token.value)
+        if op is not None:
+            self.advance()
+            return op, token.kind == "NAME"
+        if self.accept_words("integer", "divide"):
+            return ast.FloorDiv, True
+        return None, False
+
+    def factor(self):
+        start = self.token
+        value = start.value
+        if value in UNARY_OPERATORS and start.kind == "OP":
+            self.advance()
+            return self.node(ast.UnaryOp, start, op=UNARY_OPERATORS[value](), operand=self.factor())
+        if value == "sum" and self.accept_words("sum", "of"):
+            # `sum of a multiply b` is the sum of the products.
+            return self.runtime_call("sum_of", start, [self.operation(TERM_LEVEL)])
+        if value == "array":
+            if self.accept_words("array", "from"):
+                first = self.factor()
+                if not self.accept_words("to"):
+                    self.error("expected 'to'")
+                return self.runtime_call("array_range", start, [first, self.factor()])
+            if self.accept_words("array", "of"):
+                return self.runtime_call("to_array", start, [self.factor()])
+        return self.power()
+
+    def runtime_call(self, name, start, args):
+        self.uses_runtime = True
+        module = self.node(ast.Name, start, id=RUNTIME_MODULE, ctx=ast.Load())
+        function = self.node(ast.Attribute, start, value=module, attr=name, ctx=ast.Load())
+        return self.node(ast.Call, start, func=function, args=args, keywords=[])
+
+    def power(self):
+        start = self.token
+        if start.value == "await" or start.value == "wait" and self.peek(1).value == "for":
+            base = self.await_primary()
+        else:
+            base = self.primary()
+        if self.token.value in ("**", "power"):
+            self.advance()
+            word = self.previous.kind == "NAME"
+            node = self.node(ast.BinOp, start, left=base, op=ast.Pow(), right=self.factor())
+            node.word_operator = word
+            return node
+        return base
+
+    def await_primary(self):
+        start = self.advance()
+        if start.is_word("wait"):
+            self.advance()
+        self.uses_concurrency = True
+        return self.node(ast.Await, start, value=self.primary())
+
+    def primary(self):
+        start = self.token
+        if start.kind == "NAME" and start.value not in RESERVED_NAMES:
+            # A plain name, much the most common atom.
+            self.advance()
+            node = self.node(ast.Name, start, id=start.value, ctx=ast.Load())
+        else:
+            node = self.atom()
+        while True:
+            token = self.token
+            if token.value not in (".", "(", "[") or token.kind != "OP":
+                return node
+            self.advance()
+            if token.value == ".":
+                node = self.node(ast.Attribute, start, value=node, attr=self.expect_name(), ctx=ast.Load())
+            elif token.value == "(":
+                args, keywords = self.call_arguments(")")
+                self.expect_op(")")
+                node = self.node(ast.Call, start, func=node, args=args, keywords=keywords)
+            else:
+                index = self.slices()
+                self.expect_op("]")
+                node = self.node(ast.Subscript, start, value=node, slice=index, ctx=ast.Load())
+
+    def call_arguments(self, closing):
+        opening = self.previous
+        args, keywords = [], []
+        while not (self.token.is_op(closing) if closing else self.at_end_of_statement()):
+            start = self.token
+            if self.accept_op("**"):
+                keywords.append(self.node(ast.keyword, start, arg=None, value=self.expression()))
+            elif self.accept_op("*"):
+                args.append(self.node(ast.Starred, start, value=self.expression(), ctx=ast.Load()))
+            elif start.kind == "NAME" and (self.peek(1).is_op("=") or self.peek(1).is_word("becomes")):
+                self.advance()
+                self.advance()
+                keywords.append(self.node(ast.keyword, start, arg=start.value, value=self.expression()))
+            else:
+                value = self.named_expression()
+                if self.token.is_word("for"):
+                    value = self.node(ast.GeneratorExp, start, elt=value, generators=self.comprehension())
+                    if closing and self.token.is_op(closing) and not args and not keywords:
+                        # A generator that is the only argument takes the
+                        # call's brackets as its own, as in Python.
+                        value.lineno, value.col_offset = opening.line, opening.column
+                        value.end_lineno, value.end_col_offset = self.token.end_line, self.token.end_column
+                args.append(value)
+            if not self.accept_op(","):
+                break
+        return args, keywords
+
+    def slices(self):
+        start = self.token
+        items = [self.slice_item()]
+        while self.accept_op(","):
+            if self.token.is_op("]"):
+                break
+            items.append(self.slice_item())
+        if len(items) == 1 and not self.previous.is_op(",") and not isinstance(items[0], ast.Starred):
+            return items[0]
+        return self.node(ast.Tuple, start, elts=items, ctx=ast.Load())
+
+    def slice_item(self):
+        start = self.token
+        lower = None if self.token.is_op(":") else self.star_or(self.named_expression)
+        if not self.accept_op(":"):
+            return lower
+        upper = None if self.token.is_op(":", "]", ",") else self.expression()
+        step = None
+        if self.accept_op(":"):
+            step = None if self.token.is_op("]", ",") else self.expression()
+        return self.node(ast.Slice, start, lower=lower, upper=upper, step=step)
+
+    def comprehension(self):
+        generators = []
+        while self.token.is_word("for", "async"):
+            is_async = int(self.accept_words("async"))
+            self.advance()
+            target = self.target_expression()
+            if not (self.accept_words("in") or self.accept_words("within")):
+                self.error("expected 'in' or 'within'")
+            iterator = self.disjunction()
+            conditions = []
+            while self.accept_words("if"):
+                conditions.append(self.disjunction())
+            generators.append(ast.comprehension(target=target, iter=iterator, ifs=conditions, is_async=is_async))
+        return generators
+
+    def atom(self):
+        start = self.token
+        if start.kind == "NAME":
+            if start.value in CONSTANTS:
+                self.advance()
+                return self.node(ast.Constant, start, value=CONSTANTS[start.value])
+            if start.is_word("yield"):
+                return self.yield_expression()
+            return self.node(ast.Name, start, id=self.expect_name(), ctx=ast.Load())
+        if start.kind == "NUMBER":
+            self.advance()
+            value = start.value
+            if value.isdigit() and (value[0] != "0" or value == "0"):
+                return self.node(ast.Constant, start, value=int(value))
+            return self.node(ast.Constant, start, value=ast.literal_eval(value))
+        if start.kind == "STRING":
+            return self.strings()
+        if start.is_op("..."):
+            self.advance()
+            return self.node(ast.Constant, start, value=Ellipsis)
+        if start.is_op("("):
+            return self.parenthesized()
+        if start.is_op("["):
+            return self.list_display()
+        if start.is_op("{"):
+            return self.brace_display()
+        self.error("invalid syntax")
+
+    def strings(self):
+        # Plain literals are handed to Python's own parser, which knows every
+        # prefix and escape. Keyword translation never reaches their contents;
+        # only the {fields} of f-strings are parsed as CobraLang.
+        start = self.token
+        parts = []
+        while self.token.kind == "STRING":
+            parts.append(self.advance().value)
+        literal = parts[0]
+        if len(parts) == 1 and literal[0] in "\"'" and "\\" not in literal and literal[:3] not in ('"""', "\'\'\'"):
+            # A plain one-line literal without escapes is its own value.
+            return self.located(ast.Constant(value=literal[1:-1]), start)
+        try:
+            if not any("f" in part[:part.index(part[-1])].lower() for part in parts):
+                value = ast.literal_eval("(" + "\n".join(parts) + ")")
+                kind = "u" if literal[0] in "uU" else None
+                return self.located(ast.Constant(value=value, kind=kind), start)
+            values = []
+            for part in parts:
+                values.extend(self.string_values(part, start))
+        except SyntaxError as e:
+            raise SyntaxError(e.msg, (self.filename, start.line, start.column + 1, None)) from None
+
+        merged = []
+        for value in values:
+            if merged and isinstance(value, ast.Constant) and isinstance(merged[-1], ast.Constant):
+                merged[-1].value += value.value
+            else:
+                merged.append(value)
+        return self.node(ast.JoinedStr, start, values=merged)
+
+    def string_values(self, literal, start):
+        quote_start = min(literal.index(quote) for quote in "\"'" if quote in literal)
+        prefix = literal[:quote_start].lower()
+        quote = literal[quote_start:quote_start + 3]
+        if quote not in ('"""', "\'\'\'"):
+            quote = quote[0]
+        body = literal[quote_start + len(quote):-len(quote)]
+        if "f" not in prefix:
+            return [self.located(ast.Constant(value=ast.literal_eval(literal)), start)]
+        return self.fstring_values(body, prefix.replace("f", ""), quote, start)
+
+    def fstring_values(self, body, prefix, quote, start):
+        values = []
+        text = []
+        index = 0
+
+        def flush():
+            if text:
+                chunk = "".join(text)
+                if "r" in prefix:
+                    value = chunk
+                else:
+                    # The space keeps a chunk that ends in a quote or a
+                    # backslash clear of the closing quote.
+                    value = ast.literal_eval(prefix + quote + chunk + " " + quote)[:-1]
+                values.append(self.located(ast.Constant(value=value), start))
+                text.clear()
+
+        while index < len(body):
+            character = body[index]
+            if character == "\\" and "r" not in prefix:
+                # An escape, including a named one like \N{BULLET}, whose
+                # braces are not a field.
+                end = index + 1 if body[index + 1:index + 2] in ("{", "}") else index + 2
+                if body.startswith("N{", index + 1):
+                    end = body.find("}", index) + 1 or len(body)
+                text.append(body[index:end])
+                index = end
+            elif body.startswith("{{", index) or body.startswith("}}", index):
+                text.append(character)
+                index += 2
+            elif character == "{":
+                flush()
+                end = self.fstring_field_end(body, index + 1)
+                values.extend(self.fstring_field(body[index + 1:end], prefix, quote, start))
+                index = end + 1
+            elif character == "}":
+                raise SyntaxError("f-string: single '}' is not allowed")
+            else:
+                text.append(character)
+                index += 1
+        flush()
+        return values
+
+    def fstring_field_end(self, body, index):
+        depth = 0
+        while index < len(body):
+            character = body[index]
+            if character in "\"'":
+                index = quoted_end(body, index)
+            elif character in "([{":
+                depth += 1
+            elif character in ")]}":
+                if depth == 0 and character == "}":
+                    return index
+                depth -= 1
+            index += 1
+        raise SyntaxError("f-string: expecting '}'")
+
+    def fstring_field(self, field, prefix, quote, start):
+        # Splits `expression!conversion:format_spec` at the top level.
+        depth = 0
+        split = len(field)
+        index = 0
+        while index < len(field):
+            character = field[index]
+            if character in "\"'":
+                index = quoted_end(field, index)
+            elif character in "([{":
+                depth += 1
+            elif character in ")]}":
+                depth -= 1
+            elif depth == 0 and (character == ":" or character == "!" and field[index + 1:index + 2] != "="):
+                split = index
+                break
+            index += 1
+        expression_text, rest = field[:split], field[split:]
+        values = []
+        stripped = expression_text.rstrip()
+        if stripped.endswith("=") and not stripped.endswith(("==", "!=", "<=", ">=")):
+            # `{x=}` writes out its own text before the value, which is
+            # shown with repr() unless a conversion or format is given.
+            values.append(self.located(ast.Constant(value=expression_text), start))
+            expression_text = stripped[:-1]
+            if not rest:
+                rest = "!r"
+
+        conversion = -1
+        if rest.startswith("!"):
+            conversion = ord(rest[1:2] or " ")
+            if chr(conversion) not in "sra":
+                raise SyntaxError("f-string: invalid conversion character")
+            rest = rest[2:]
+        format_spec = None
+        if rest.startswith(":"):
+            format_spec = self.node(ast.JoinedStr, start,
+                                    values=self.fstring_values(rest[1:], prefix, quote, start))
+        elif rest:
+            raise SyntaxError("f-string: expecting '}'")
+
+        parser = Parser(["(" + expression_text + ")"], self.filename)
+        value = parser.star_expressions()
+        if parser.token.kind not in ("NEWLINE", "ENDMARKER"):
+            raise SyntaxError("f-string: invalid syntax")
+        for child in ast.walk(value):
+            if "lineno" in child._attributes:
+                self.located(child, start)
+        values.append(self.node(ast.FormattedValue, start, value=value, conversion=conversion,
+                                format_spec=format_spec))
+        return values
+
+    def parenthesized(self):
+        start = self.advance()
+        if self.accept_op(")"):
+            return self.node(ast.Tuple, start, elts=[], ctx=ast.Load())
+        if self.token.is_word("yield"):
+            value = self.yield_expression()
+            self.expect_op(")")
+            return value
+        first = self.star_or(self.named_expression)
+        if self.token.is_word("for", "async"):
+            generators = self.comprehension()
+            self.expect_op(")")
+            return self.node(ast.GeneratorExp, start, elt=first, generators=generators)
+        if self.accept_op(")"):
+            return first
+        elements = [first]
+        while self.accept_op(","):
+            if self.token.is_op(")"):
+                break
+            elements.append(self.star_or(self.named_expression))
+        self.expect_op(")")
+        return self.node(ast.Tuple, start, elts=elements, ctx=ast.Load())
+
+    def yield_expression(self):
+        start = self.advance()
+        if self.accept_words("from"):
+            return self.node(ast.YieldFrom, start, value=self.expression())
+        value = None if self.token.is_op(")") or self.at_end_of_statement() else self.star_expressions()
+        return self.node(ast.Yield, start, value=value)
+
+    def list_display(self):
+        start = self.advance()
+        if self.accept_op("]"):
+            return self.node(ast.List, start, elts=[], ctx=ast.Load())
+        first = self.star_or(self.named_expression)
+        if self.token.is_word("for", "async"):
+            generators = self.comprehension()
+            self.expect_op("]")
+            return self.node(ast.ListComp, start, elt=first, generators=generators)
+        elements = [first]
+        while self.accept_op(","):
+            if self.token.is_op("]"):
+                break
+            elements.append(self.star_or(self.named_expression))
+        self.expect_op("]")
+        return self.node(ast.List, start, elts=elements, ctx=ast.Load())
+
+    def brace_display(self):
+        start = self.advance()
+        if self.accept_op("}"):
+            return self.node(ast.Dict, start, keys=[], values=[])
+        if self.accept_op("**"):
+            keys, values = [None], [self.bitwise_or()]
+        else:
+            first = self.star_or(self.expression)
+            if not self.accept_op(":"):
+                return self.set_display(start, first)
+            value = self.expression()
+            if self.token.is_word("for", "async"):
+                generators = self.comprehension()
+                self.expect_op("}")
+                return self.node(ast.DictComp, start, key=first, value=value, generators=generators)
+            keys, values = [first], [value]
+        while self.accept_op(","):
+            if self.token.is_op("}"):
+                break
+            if self.accept_op("**"):
+                keys.append(None)
+                values.append(self.bitwise_or())
+            else:
+                keys.append(self.expression())
+                self.expect_op(":")
+                values.append(self.expression())
+        self.expect_op("}")
+        return self.node(ast.Dict, start, keys=keys, values=values)
+
+    def set_display(self, start, first):
+        if self.token.is_word("for", "async"):
+            generators = self.comprehension()
+            self.expect_op("}")
+            return self.node(ast.SetComp, start, elt=first, generators=generators)
+        elements = [first]
+        while self.accept_op(","):
+            if self.token.is_op("}"):
+                break
+            elements.append(self.star_or(self.expression))
+        self.expect_op("}")
+        return self.node(ast.Set, start, elts=elements)
+
+
+class OwnRenamer(ast.NodeTransformer):
+    # Inside a method `own` is the instance, whatever the first parameter is
+    # called. Nested classes get their own handling, so they are skipped.
+    def __init__(self, instance_name):
+        self.instance_name = instance_name
+
+    def visit_Name(self, node):
+        if node.id == "own":
+            node.id = self.instance_name
+        return node
+
+    def visit_ClassDef(self, node):
+        return node
+
+
+class ParallelBodyChecker(ast.NodeTransformer):
+    # The body of `repeat in parallel` becomes a function run once per
+    # iteration, so `skip` ends the iteration and `exit` has no meaning.
+    # Nested loops and functions keep their own skip and exit.
+    def __init__(self, parser, construct="repeat in parallel loop"):
+        self.filename = parser if isinstance(parser, str) else parser.filename
+        self.construct = construct
+
+    def visit_body(self, body):
+        return [self.visit(statement) for statement in body]
+
+    def visit_Continue(self, node):
+        return ast.copy_location(ast.Return(value=None), node)
+
+    def visit_Break(self, node):
+        raise SyntaxError(f"'exit' cannot end a {self.construct} early",
+                          (self.filename, node.lineno, node.col_offset + 1, None))
+
+    def skip(self, node):
+        return node
+
+    visit_For = visit_AsyncFor = visit_While = skip
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = visit_Lambda = skip
+
+
+class Concurrently(ast.stmt):
+    # A `concurrently:` block as parsed. ConcurrencyTransformer replaces it
+    # once it knows which scope the block is in.
+    _fields = ("body",)
+
+
+def contains_await(node):
+    # Whether node awaits directly, not counting nested functions or classes.
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Await):
+            return True
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)) \
+                and contains_await(child):
+            return True
+    return False
+
+
+def bound_names(node):
+    # Names a statement binds in its own scope.
+    names = []
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, (ast.Store, ast.Del)):
+            names.append(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.append(child.name)
+        elif isinstance(child, ast.alias):
+            names.append(child.asname or child.name.partition(".")[0])
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.append(child.name)
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+                                  ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            names.extend(bound_names(child))
+    return names
+
+
+class ConcurrencyTransformer(ast.NodeTransformer):
+    # Turns every `concurrently:` block into task functions run by
+    # run_concurrently, one per statement, or one per iteration of a loop
+    # written directly in the block. Tasks declare the names they assign
+    # global or nonlocal, so results are visible after the block. Functions
+    # that now await anything become `async def`; at the top level the
+    # program itself becomes a coroutine, which run_code drives.
+    def __init__(self, filename):
+        self.filename = filename
+        self.scopes = [("module", set(), set())]
+
+    def visit_FunctionDef(self, node):
+        declared_global, declared_nonlocal = set(), set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Global):
+                declared_global.update(child.names)
+            elif isinstance(child, ast.Nonlocal):
+                declared_nonlocal.update(child.names)
+        self.scopes.append(("function", declared_global, declared_nonlocal))
+        self.generic_visit(node)
+        self.scopes.pop()
+        if isinstance(node, ast.FunctionDef) and contains_await(node):
+            node = ast.copy_location(make_node(ast.AsyncFunctionDef, **{
+                field: getattr(node, field) for field in node._fields}), node)
+            node.end_lineno, node.end_col_offset = node.body[-1].end_lineno, node.body[-1].end_col_offset
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.scopes.append(("class", set(), set()))
+        self.generic_visit(node)
+        self.scopes.pop()
+        return node
+
+    def visit_Concurrently(self, node):
+        kind, declared_global, declared_nonlocal = self.scopes[-1]
+        if kind == "class":
+            raise SyntaxError("'concurrently' cannot be used directly in a class body",
+                              (self.filename, node.lineno, node.col_offset + 1, None))
+        helpers = {CONCURRENT_TASK_NAME, CONCURRENT_TASKS_NAME}
+        names = [name for name in dict.fromkeys(bound_names(ast.Module(body=node.body, type_ignores=[])))
+                 if name not in helpers]
+
+        def located(new_node, old_node=node):
+            return ast.copy_location(new_node, old_node)
+
+        def load(name):
+            return located(ast.Name(id=name, ctx=ast.Load()))
+
+        def task(body, parameters, old_node):
+            declared = [name for name in names if name not in parameters]
+            declarations = []
+            if kind == "module":
+                if declared:
+                    declarations.append(located(ast.Global(names=declared), old_node))
+            else:
+                nested = [name for name in declared if name not in declared_global]
+                if declared_global & set(declared):
+                    declarations.append(located(ast.Global(names=sorted(declared_global & set(declared))), old_node))
+                if nested:
+                    declarations.append(located(ast.Nonlocal(names=nested), old_node))
+            arguments = ast.arguments(
+                posonlyargs=[], args=[located(ast.arg(arg=name, annotation=None), old_node) for name in parameters],
+                vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None,
+                defaults=[located(ast.Name(id=name, ctx=ast.Load()), old_node) for name in parameters])
+            function = located(make_node(ast.FunctionDef, name=CONCURRENT_TASK_NAME, args=arguments,
+                                         body=declarations + body, decorator_list=[], returns=None), old_node)
+            append = located(ast.Attribute(value=load(CONCURRENT_TASKS_NAME), attr="append", ctx=ast.Load()),
+                             old_node)
+            call = located(ast.Call(func=append, args=[load(CONCURRENT_TASK_NAME)], keywords=[]), old_node)
+            return [self.visit(function), located(ast.Expr(value=call), old_node)]
+
+        statements = []
+        if kind == "function":
+            # A nonlocal needs a binding in the enclosing function; an
+            # annotation makes the name local there without assigning it.
+            statements.extend(located(ast.AnnAssign(target=ast.Name(id=name, ctx=ast.Store()),
+                                                    annotation=load("object"), value=None, simple=1))
+                              for name in names if name not in declared_global | declared_nonlocal)
+        tasks = located(ast.Assign(targets=[ast.Name(id=CONCURRENT_TASKS_NAME, ctx=ast.Store())],
+                                   value=located(ast.List(elts=[], ctx=ast.Load()))))
+        statements.append(tasks)
+        for statement in node.body:
+            if isinstance(statement, ast.For) and not statement.orelse:
+                parameters = [name for name in bound_names(ast.Expr(value=statement.target))]
+                body = ParallelBodyChecker(self.filename, "loop in a concurrently block").visit_body(statement.body)
+                statement.body = task(body, parameters, statement)
+                statements.append(statement)
+            else:
+                statements.extend(task([statement], [], statement))
+        run = located(ast.Attribute(value=load(RUNTIME_MODULE), attr="run_concurrently", ctx=ast.Load()))
+        call = located(ast.Call(func=run, args=[load(CONCURRENT_TASKS_NAME)], keywords=[]))
+        statements.append(located(ast.Expr(value=located(ast.Await(value=call)))))
+        return statements
+
+
+def uses_own(node):
+    return any(isinstance(child, ast.Name) and child.id == "own" for child in ast.walk(node))
+
+
+class ClassBuilder:
+    # Turns a CobraLang class into a Python one. A header like
+    # `class Player(name, health becomes 100):` whose body assigns through
+    # `own.` at class level lists constructor parameters, not base classes:
+    # those assignments become the body of a generated __init__.
+    def __init__(self, parser):
+        self.parser = parser
+
+    def build(self, node, dynamic=False):
+        initializer = [statement for statement in node.body
+                       if not isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+                       and uses_own(statement)]
+        if initializer:
+            node.body = [self.constructor(node, initializer)] + [
+                statement for statement in node.body if statement not in initializer]
+            node.bases, node.keywords = [], []
+
+        for statement in node.body:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                parameters = statement.args.posonlyargs + statement.args.args
+                if parameters:
+                    OwnRenamer(parameters[0].arg).visit(statement)
+        if not dynamic:
+            self.add_slots(node)
+        return node
+
+    def add_slots(self, node):
+        # Gives instances fixed slots instead of a __dict__ when every
+        # attribute they can get is visible here: assigned through the
+        # instance in one of the class's own methods. Classes with bases,
+        # decorators or a metaclass may get attributes from elsewhere, and a
+        # class-level name clashing with an attribute cannot be a slot, so
+        # those are left alone. `dynamic class` opts out entirely.
+        if node.bases or node.keywords or node.decorator_list:
+            return
+        class_names = set()
+        attributes = {}
+        for statement in node.body:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                class_names.add(statement.name)
+                if not any(isinstance(decorator, ast.Name) and decorator.id in ("staticmethod", "classmethod")
+                           for decorator in statement.decorator_list):
+                    attributes.update(dict.fromkeys(self.instance_attributes(statement)))
+            else:
+                for child in ast.walk(statement):
+                    if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                        class_names.add(child.id)
+                    elif isinstance(child, ast.ClassDef):
+                        class_names.add(child.name)
+        if "__init__" not in class_names or not attributes or "__slots__" in class_names \
+                or class_names & attributes.keys():
+            return
+        names = [*attributes, "__weakref__"]
+        slots = make_node(ast.Assign, targets=[ast.Name(id="__slots__", ctx=ast.Store())],
+                          value=ast.Tuple(elts=[ast.Constant(value=name) for name in names], ctx=ast.Load()))
+        index = 1 if ast.get_docstring(node, clean=False) is not None else 0
+        node.body.insert(index, ast.fix_missing_locations(ast.copy_location(slots, node.body[index])))
+
+    def instance_attributes(self, function):
+        parameters = function.args.posonlyargs + function.args.args
+        if not parameters:
+            return []
+        instance = parameters[0].arg
+        return [child.attr for child in ast.walk(function)
+                if isinstance(child, ast.Attribute) and isinstance(child.ctx, (ast.Store, ast.Del))
+                and isinstance(child.value, ast.Name) and child.value.id == instance]
+
+    def constructor(self, node, body):
+        parameters, defaults = [], []
+        for base in node.bases:
+            if not isinstance(base, ast.Name):
+                self.fail(base, "constructor parameters must be plain names")
+            if defaults:
+                self.fail(base, "non-default argument follows default argument")
+            parameters.append(ast.copy_location(ast.arg(arg=base.id, annotation=None), base))
+        for keyword_node in node.keywords:
+            if keyword_node.arg is None:
+                self.fail(keyword_node, "constructor parameters must be plain names")
+            parameters.append(ast.copy_location(ast.arg(arg=keyword_node.arg, annotation=None), keyword_node))
+            defaults.append(keyword_node.value)
+
+        instance = ast.copy_location(ast.arg(arg="self", annotation=None), node)
+        arguments = ast.arguments(posonlyargs=[], args=[instance] + parameters, vararg=None, kwonlyargs=[],
+                                  kw_defaults=[], kwarg=None, defaults=defaults)
+        function = make_node(ast.FunctionDef, name="__init__", args=arguments, body=body,
+                             decorator_list=[], returns=None)
+        ast.copy_location(function, body[0])
+        function.end_lineno, function.end_col_offset = body[-1].end_lineno, body[-1].end_col_offset
+        return function
+
+    def fail(self, node, message):
+        raise SyntaxError(message, (self.parser.filename, node.lineno, node.col_offset + 1, None))
+
+
+@contextlib.contextmanager
+def collection_paused():
+    # Parsing and compiling allocate a great many objects and free none of
+    # them along the way, so garbage collection passes would find nothing.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+def cl_to_ast(cobralang_code, filename="<cobralang>", timings=None):
+    # Parses CobraLang straight into a Python ast.Module, ready for compile().
+    # With timings, parsing and the rewriting of `concurrently:` blocks are
+    # recorded as phases.
+    if isinstance(cobralang_code, str):
+        cobralang_code = cobralang_code.splitlines(keepends=True)
+    parser = Parser(cobralang_code, filename)
+    phase = timings.phase if timings is not None else no_phase
+    with phase("parse"), collection_paused():
+        if timings is None:
+            module = parser.parse_module()
+        else:
+            module = ast.Module(body=timings.parse_statements(parser, cobralang_code), type_ignores=[])
+    if parser.uses_concurrency:
+        with phase("concurrently"):
+            module = ast.fix_missing_locations(ConcurrencyTransformer(filename).visit(module))
+    if parser.uses_runtime:
+        # After the docstring and __future__ imports, which must come first.
+        index = 0
+        for statement in module.body:
+            if isinstance(statement, ast.ImportFrom) and statement.module == "__future__":
+                index += 1
+            elif index == 0 and isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant) \
+                    and isinstance(statement.value.value, str):
+                index += 1
+            else:
+                break
+        runtime_import = ast.Import(names=[ast.alias(name="transl", asname=RUNTIME_MODULE)])
+        runtime_import = ast.copy_location(runtime_import, module.body[index - 1] if index else module.body[0])
+        module.body.insert(index, ast.fix_missing_locations(runtime_import))
+    # The parser locates every node it makes, so only the nodes added
+    # afterwards need fix_missing_locations, not a walk of the whole tree.
+    return module
+
+def compile_ast(module, filename="<cobralang>"):
+    # Top-level `wait for` and `concurrently:` are allowed; such a program
+    # compiles to a coroutine, see run_code.
+    return compile(module, filename, 'exec', flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+
+def compile_cl(cobralang_code, filename="<cobralang>"):
+    with collection_paused():
+        return compile_ast(cl_to_ast(cobralang_code, filename), filename)
+
+def run_code(code, namespace):
+    if not code.co_flags & inspect.CO_COROUTINE:
+        exec(code, namespace)
+        return
+    coroutine = eval(code, namespace)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        running = False
+    else:
+        running = True
+    if not running:
+        asyncio.run(coroutine)
+        return
+    # Imported from code already running on a loop, so this module gets a
+    # loop of its own on another thread.
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        executor.submit(asyncio.run, coroutine).result()
+
+def number_values(values):
+    # Integers are kept as 64-bit ints, anything else as doubles.
+    if not isinstance(values, (list, tuple, range, array.array)):
+        values = list(values)
+    try:
+        return array.array('q', values)
+    except (TypeError, OverflowError):
+        return array.array('d', values)
+
+class NumberArray:
+    # Element-wise numeric array used when NumPy is not installed. Values
+    # live in a typed array.array and every operation runs through map()
+    # with a C function from operator, so no Python code runs per element.
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = values if isinstance(values, array.array) else number_values(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NumberArray(self.values[index])
+        return self.values[index]
+
+    def __setitem__(self, index, value):
+        self.values[index] = value
+
+    def __repr__(self):
+        return f"array({self.values.tolist()})"
+
+    def __str__(self):
+        values = self.values
+        if len(values) > 1000:
+            shown = [*map(str, values[:3]), "...", *map(str, values[-3:])]
+        else:
+            shown = list(map(str, values))
+        return f"[{' '.join(shown)}]"
+
+    def tolist(self):
+        return self.values.tolist()
+
+    def sum(self):
+        return sum(self.values)
+
+    def elementwise(self, other, function, reverse=False):
+        if isinstance(other, NumberArray):
+            if len(other) != len(self):
+                raise ValueError(f"arrays have different lengths ({len(self)} and {len(other)})")
+            other = other.values
+        elif isinstance(other, (int, float)):
+            other = itertools.repeat(other, len(self))
+        else:
+            return NotImplemented
+        if reverse:
+            return NumberArray(number_values(list(map(function, other, self.values))))
+        return NumberArray(number_values(list(map(function, self.values, other))))
+
+    def __add__(self, other):
+        return self.elementwise(other, operator.add)
+
+    def __radd__(self, other):
+        return self.elementwise(other, operator.add, True)
+
+    def __sub__(self, other):
+        return self.elementwise(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self.elementwise(other, operator.sub, True)
+
+    def __mul__(self, other):
+        return self.elementwise(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self.elementwise(other, operator.mul, True)
+
+    def __truediv__(self, other):
+        return self.elementwise(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self.elementwise(other, operator.truediv, True)
+
+    def __floordiv__(self, other):
+        return self.elementwise(other, operator.floordiv)
+
+    def __rfloordiv__(self, other):
+        return self.elementwise(other, operator.floordiv, True)
+
+    def __mod__(self, other):
+        return self.elementwise(other, operator.mod)
+
+    def __rmod__(self, other):
+        return self.elementwise(other, operator.mod, True)
+
+    def __pow__(self, other):
+        return self.elementwise(other, operator.pow)
+
+    def __rpow__(self, other):
+        return self.elementwise(other, operator.pow, True)
+
+    def __neg__(self):
+        return NumberArray(number_values(list(map(operator.neg, self.values))))
+
+    def __abs__(self):
+        return NumberArray(number_values(list(map(abs, self.values))))
+
+def array_range(first, last):
+    # `array from first to last`; like `repeat`, last is included.
+    if numpy is not None:
+        return numpy.arange(first, last + 1)
+    if isinstance(first, int) and isinstance(last, int):
+        return NumberArray(array.array('q', range(first, last + 1)))
+    return NumberArray([first + step for step in range(int(last - first) + 1)])
+
+def to_array(values):
+    if numpy is not None:
+        return numpy.asarray(values)
+    return values if isinstance(values, NumberArray) else NumberArray(values)
+
+def sum_of(values):
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values.sum().item()
+    if isinstance(values, NumberArray):
+        return values.sum()
+    return sum(values)
+
+parallel_bodies = {}
+in_parallel_worker = False
+
+def run_parallel_chunk(token, start, stop):
+    # Runs in a pool worker, forked after the loop body was registered, so
+    # the body is looked up rather than pickled; a closure cannot be. Output
+    # is captured per iteration and replayed in order by the parent, which
+    # also keeps the worker off streams it shares with the parent, such as
+    # the IDE's pipe.
+    global in_parallel_worker
+    in_parallel_worker = True
+    body = parallel_bodies[token]
+    results = []
+    stdout, stderr = sys.stdout, sys.stderr
+    for index in range(start, stop):
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+        try:
+            value = body(index)
+        except BaseException as e:
+            # Output of the chunk so far travels with the exception, so
+            # the parent can print it before the traceback.
+            e.parallel_output = "".join(output for _, output, _ in results) + sys.stdout.getvalue()
+            e.parallel_errors = "".join(errors for _, _, errors in results) + sys.stderr.getvalue()
+            e.add_note(f"in iteration {index} of repeat in parallel")
+            raise
+        finally:
+            output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+            sys.stdout, sys.stderr = stdout, stderr
+        results.append((value, output, errors))
+    return results
+
+def parallel_repeat(body, start, stop, workers=None):
+    # Runs body(i) for i in range(start, stop) across a process pool and
+    # returns the results in order. Iterations run in separate processes,
+    # so they only see the program's state as it was when the loop started.
+    # Without fork (Windows) or inside a worker, the loop runs serially.
+    count = max(0, stop - start)
+    workers = min(workers or os.cpu_count() or 1, count)
+    if workers <= 1 or in_parallel_worker or "fork" not in multiprocessing.get_all_start_methods():
+        return [body(index) for index in range(start, stop)]
+
+    chunk_size = -(-count // (workers * PARALLEL_CHUNKS_PER_WORKER))
+    token = id(body)
+    parallel_bodies[token] = body
+    sys.stdout.flush()
+    sys.stderr.flush()
+    executor = concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context("fork"))
+    try:
+        futures = [executor.submit(run_parallel_chunk, token, chunk, min(chunk + chunk_size, stop))
+                   for chunk in range(start, stop, chunk_size)]
+        results = []
+        for future in futures:
+            try:
+                chunk_results = future.result()
+            except BaseException as e:
+                sys.stdout.write(getattr(e, "parallel_output", ""))
+                sys.stderr.write(getattr(e, "parallel_errors", ""))
+                raise
+            for value, output, errors in chunk_results:
+                if output:
+                    sys.stdout.write(output)
+                if errors:
+                    sys.stderr.write(errors)
+                results.append(value)
+        return results
+    finally:
+        executor.shutdown(cancel_futures=True)
+        del parallel_bodies[token]
+
+remembered_functions = weakref.WeakSet()
+
+def remember(size=REMEMBER_SIZE):
+    # Decorator behind `remember define`. The cache keeps the `size` most
+    # recently used results; cache_info() on the function gives its hits
+    # and misses, and remember_report() prints them for every function.
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+            raise TypeError(f"cannot remember {function.__name__}(): it waits for something, "
+                            "and a waited-for result can only be used once")
+        cached = functools.lru_cache(maxsize=size)(function)
+        remembered_functions.add(cached)
+        return cached
+    return decorate
+
+def remember_report(file=None):
+    if file is None:
+        file = sys.stderr
+    codes = {function: function.__wrapped__.__code__ for function in list(remembered_functions)}
+    for function, code in sorted(codes.items(), key=lambda item: (item[1].co_filename, item[1].co_firstlineno)):
+        info = function.cache_info()
+        calls = info.hits + info.misses
+        rate = info.hits / calls if calls else 0
+        limit = "all" if info.maxsize is None else f"{info.maxsize:,}"
+        print(f"{function.__qualname__} ({os.path.basename(code.co_filename)}:{code.co_firstlineno}): "
+              f"{info.hits:,} hits, {info.misses:,} misses, {rate:.1%} hit rate, "
+              f"keeping {info.currsize:,} of {limit} results", file=file)
+
+concurrent_executor = None
+
+async def run_concurrently(tasks):
+    # Runs the tasks of a `concurrently:` block together and waits for all
+    # of them. Async tasks run on the event loop; plain ones, which may
+    # block on files, sockets or subprocesses, run on a thread pool. The
+    # first error cancels the tasks still waiting and is raised.
+    global concurrent_executor
+    loop = asyncio.get_running_loop()
+    futures = []
+    for task in tasks:
+        if inspect.iscoroutinefunction(task):
+            futures.append(asyncio.ensure_future(task()))
+        else:
+            if concurrent_executor is None:
+                concurrent_executor = concurrent.futures.ThreadPoolExecutor(CONCURRENT_THREADS)
+            futures.append(loop.run_in_executor(concurrent_executor, task))
+    try:
+        await asyncio.gather(*futures)
+    finally:
+        for future in futures:
+            future.cancel()
+
+def cache_key(source):
+    digest = hashlib.sha256()
+    digest.update(importlib.util.MAGIC_NUMBER)
+    digest.update(TRANSLATOR_VERSION.encode())
+    digest.update(repr(TRANSLATIONS).encode())
+    digest.update(source)
+    return importlib.util.MAGIC_NUMBER + digest.digest()
+
+def cache_path(file_path):
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, CACHE_DIR_NAME, f"{name}.{sys.implementation.cache_tag}.clc")
+
+def load_cached(path, key):
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    if not data.startswith(key):
+        return None
+    try:
+        code = marshal.loads(data[len(key):])
+        os.utime(path)
+    except (EOFError, ValueError, TypeError, OSError):
+        return None
+    return code
+
+def with_filename(code, filename):
+    # A cached code object keeps the file name it was compiled with, which
+    # may be a different relative path to the same file, so it is set to the
+    # current one, in nested functions and classes too.
+    if code.co_filename == filename:
+        return code
+    constants = tuple(with_filename(constant, filename) if isinstance(constant, types.CodeType) else constant
+                      for constant in code.co_consts)
+    return code.replace(co_filename=filename, co_consts=constants)
+
+def store_cached(path, key, code):
+    directory = os.path.dirname(path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            file.write(key + marshal.dumps(code))
+        os.replace(temp_path, path)
+        prune_cache(directory)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+def prune_cache(directory, max_bytes=None):
+    # Drops entries whose source is gone, then the least recently used ones
+    # until the directory fits in max_bytes.
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    source_directory = os.path.dirname(directory)
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".clc"):
+            continue
+        source_name = entry.name.rsplit(".", 2)[0]
+        stat = entry.stat()
+        if not os.path.exists(os.path.join(source_directory, source_name)):
+            os.remove(entry.path)
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class Timings:
+    # Wall time and memory per phase of running a program, filled in by
+    # translate(timings=...) and printed by report(). Memory is how much the
+    # process's peak RSS grew during the phase, where the platform reports
+    # one. With trace_memory, the front-end phases report the peak traced by
+    # tracemalloc instead, which is exact but makes parsing several times
+    # slower; the run itself is never traced.
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = []
+        self.cache = None
+        self.statements = 0
+        self.slowest_statements = []
+
+    @contextlib.contextmanager
+    def phase(self, name, trace_memory=True):
+        trace_memory = trace_memory and self.trace_memory
+        tracing = trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif trace_memory:
+            tracemalloc.reset_peak()
+        rss = None if trace_memory else peak_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if trace_memory:
+                memory = tracemalloc.get_traced_memory()[1]
+                if tracing:
+                    tracemalloc.stop()
+            else:
+                memory = None if rss is None else peak_rss() - rss
+            self.phases.append({"phase": name, "seconds": elapsed, "memory_bytes": memory,
+                                "memory_kind": "traced peak" if trace_memory else "peak RSS growth"})
+
+    def parse_statements(self, parser, lines, keep=5):
+        # What Parser.parse_module does, one top-level statement at a time,
+        # keeping the slowest, which is where pathological input shows up.
+        body = []
+        slowest = []
+        clock = time.perf_counter
+        while parser.token.kind != "ENDMARKER":
+            line = parser.token.line
+            start = clock()
+            body.extend(parser.statement())
+            elapsed = clock() - start
+            self.statements += 1
+            if len(slowest) < keep or elapsed > slowest[0][0]:
+                if len(slowest) == keep:
+                    slowest.pop(0)
+                slowest.append((elapsed, line, lines[line - 1].strip()))
+                slowest.sort()
+        self.slowest_statements = slowest[::-1]
+        return body
+
+    def as_dict(self):
+        return {"phases": self.phases, "cache": self.cache, "statements": self.statements,
+                "slowest_statements": [{"line": line, "seconds": seconds, "text": text}
+                                       for seconds, line, text in self.slowest_statements]}
+
+    def report(self, file=sys.stderr):
+        print(f"\n{'phase':<14} {'time':>11}  memory", file=file)
+        for phase in self.phases:
+            memory = "" if phase["memory_bytes"] is None else f"{format_bytes(phase['memory_bytes'])} {phase['memory_kind']}"
+            note = f" ({self.cache})" if phase["phase"] == "cache lookup" and self.cache else ""
+            print(f"{phase['phase']:<14} {phase['seconds'] * 1000:>8.2f} ms  {memory}{note}", file=file)
+        total = sum(phase["seconds"] for phase in self.phases)
+        print(f"{'total':<14} {total * 1000:>8.2f} ms", file=file)
+
+        if not self.slowest_statements:
+            return
+        print(f"\nSlowest of {self.statements} top-level statements to parse", file=file)
+        for seconds, line, text in self.slowest_statements:
+            print(f"{seconds * 1000:>8.3f} ms  line {line}: {text[:80]}", file=file)
+
+def no_phase(name, trace_memory=True):
+    return contextlib.nullcontext()
+
+def compile_file(file_path, cache=True, timings=None):
+    phase = timings.phase if timings is not None else no_phase
+    with phase("read"):
+        with open(file_path, 'rb') as file:
+            source = file.read()
+
+    if cache:
+        with phase("cache lookup"):
+            path = cache_path(file_path)
+            key = cache_key(source)
+            code = load_cached(path, key)
+        if timings is not None:
+            timings.cache = "miss" if code is None else "hit"
+        if code is not None:
+            return with_filename(code, file_path)
+
+    module = cl_to_ast(source.decode(), file_path, timings)
+    with phase("compile"):
+        code = compile_ast(module, file_path)
+    if cache:
+        with phase("cache store"):
+            store_cached(path, key, code)
+    return code
+
+class CobraLangLoader(importlib.abc.Loader):
+    def __init__(self, cache=True):
+        self.cache = cache
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        code = compile_file(module.__spec__.origin, self.cache)
+        run_code(code, module.__dict__)
+
+class CobraLangFinder(importlib.abc.MetaPathFinder):
+    # Resolves `import foo` to foo.cl, or to foo/__init__.cl for a package,
+    # on sys.path or the parent package's __path__. Compiled code comes from
+    # the __clcache__ cache, so only changed modules are parsed again. With
+    # lazy set, a module body runs on first attribute access rather than at
+    # import, so a program only pays for the modules it actually uses.
+    def __init__(self, lazy=True, cache=True):
+        self.lazy = lazy
+        self.cache = cache
+        self.module_names = set()
+
+    def find_spec(self, fullname, path=None, target=None):
+        name = fullname.rpartition(".")[2]
+        for directory in path if path is not None else sys.path:
+            directory = directory or "."
+            if not isinstance(directory, str) or not os.path.isdir(directory):
+                continue
+            package_init = os.path.join(directory, name, "__init__.cl")
+            if os.path.isfile(package_init):
+                return self.make_spec(fullname, package_init, [os.path.dirname(package_init)])
+            module_path = os.path.join(directory, name + ".cl")
+            if os.path.isfile(module_path):
+                return self.make_spec(fullname, module_path, None)
+        return None
+
+    def make_spec(self, fullname, origin, search_locations):
+        loader = CobraLangLoader(self.cache)
+        if self.lazy:
+            loader = importlib.util.LazyLoader(loader)
+        self.module_names.add(fullname)
+        return importlib.util.spec_from_file_location(fullname, origin, loader=loader,
+                                                      submodule_search_locations=search_locations)
+
+def install_importer(search_dir=None, lazy=True, cache=True):
+    # Puts the finder just ahead of the regular path finder, so built-in
+    # modules still win but foo.cl wins over a foo.py on the same path.
+    # search_dir, normally the directory of the program being run, goes
+    # first on sys.path like the directory of a Python script does.
+    if search_dir is not None:
+        search_dir = os.path.abspath(search_dir)
+        if search_dir not in sys.path:
+            sys.path.insert(0, search_dir)
+    for finder in sys.meta_path:
+        if isinstance(finder, CobraLangFinder):
+            finder.lazy, finder.cache = lazy, cache
+            return finder
+    finder = CobraLangFinder(lazy, cache)
+    try:
+        index = sys.meta_path.index(importlib.machinery.PathFinder)
+    except ValueError:
+        index = len(sys.meta_path)
+    sys.meta_path.insert(index, finder)
+    return finder
+
+@contextlib.contextmanager
+def buffered_output(size=OUTPUT_BUFFER_SIZE):
+    # Sends everything the program prints through one large buffer instead
+    # of stdout's usual 8 KB, so output-heavy loops make far fewer writes.
+    # The buffer is flushed when the block exits, normally or not, so output
+    # still comes out ahead of a traceback or timeout message.
+    stdout = sys.stdout
+    try:
+        descriptor = None if size is None else stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        # A stream with no file descriptor of its own, such as the IDE's
+        # pipe writer or an io.StringIO, is left to buffer in its own way.
+        descriptor = None
+    if descriptor is None:
+        yield
+        return
+    stdout.flush()
+    sys.stdout = io.TextIOWrapper(open(descriptor, 'wb', buffering=size, closefd=False),
+                                  encoding=stdout.encoding, errors=stdout.errors)
+    try:
+        yield
+    finally:
+        try:
+            sys.stdout.flush()
+        finally:
+            sys.stdout = stdout
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    # Interrupts the main thread once seconds have passed and reports it as
+    # a TimeoutError pointing at the line that was running. A program can
+    # catch the interrupt, and a long call into C never sees it, so if the
+    # block is still running TIMEOUT_GRACE_SECONDS later the process is
+    # ended with TIMEOUT_EXIT_STATUS, after flushing what was printed.
+    if seconds is None:
+        yield
+        return
+    message = f"program did not finish within {seconds:g} seconds"
+    expired = threading.Event()
+    finished = threading.Event()
+
+    def expire():
+        expired.set()
+        _thread.interrupt_main()
+        if finished.wait(TIMEOUT_GRACE_SECONDS):
+            return
+        try:
+            sys.stdout.flush()
+        except Exception:
+            pass
+        print(f"TimeoutError: {message}", file=sys.stderr, flush=True)
+        os._exit(TIMEOUT_EXIT_STATUS)
+
+    timer = threading.Timer(seconds, expire)
+    timer.daemon = True
+    timer.start()
+    # A C call that holds the GIL keeps the timer thread from running at
+    # all; faulthandler's watchdog thread does not need it.
+    faulthandler.dump_traceback_later(seconds + 2 * TIMEOUT_GRACE_SECONDS, exit=True)
+    try:
+        yield
+    except KeyboardInterrupt as e:
+        if not expired.is_set():
+            raise
+        raise TimeoutError(message).with_traceback(e.__traceback__) from None
+    finally:
+        finished.set()
+        timer.cancel()
+        faulthandler.cancel_dump_traceback_later()
+    if expired.is_set():
+        # The program caught the interrupt and finished anyway.
+        raise TimeoutError(message)
+
+def translate(file_path, debug=False, cache=True, output_buffer_size=None, timeout=None, timings=None):
+    # Pass a Timings object to have the time and memory of each phase, and
+    # the slowest statements to parse, recorded in it.
     if debug:
+        with open(file_path, 'r') as file:
+            module = cl_to_ast(file.read(), file_path)
         print("Translated Python Code:")
-        print(translated_code)
-    exec(translated_code)
+        print(ast.unparse(module))
+        code = compile_ast(module, file_path)
+    else:
+        code = compile_file(file_path, cache, timings)
+    install_importer(os.path.dirname(file_path), cache=cache)
+    phase = timings.phase("run", trace_memory=False) if timings is not None else contextlib.nullcontext()
+    with phase, buffered_output(output_buffer_size), time_limit(timeout):
+        run_code(code, {"__name__": "__main__", "__file__": file_path})
 
-if __name__ == "__main__":
+class LineSampler:
+    # Samples the main thread's stack from a background thread and keeps
+    # only CobraLang frames, which is what attributes time to .cl lines.
+    # Frames are keyed (file, function, line).
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self.stacks = collections.Counter()
+        self.ticks = 0
+        self.elapsed = 0.0
+        self.running = False
+        self.thread = threading.Thread(target=self.sample_loop, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.started = time.perf_counter()
+        # The sampler only runs when the program hands over the GIL, so
+        # ask for that to happen about as often as we sample.
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval))
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        sys.setswitchinterval(self.switch_interval)
+        self.elapsed = time.perf_counter() - self.started
+
+    def sample_loop(self):
+        while self.running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            self.ticks += 1
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename.endswith(".cl"):
+                    stack.append((code.co_filename, code.co_qualname, frame.f_lineno))
+                frame = frame.f_back
+            if not stack:
+                continue
+            stack.reverse()
+            self.self_counts[stack[-1]] += 1
+            self.total_counts.update(set(stack))
+            self.stacks[";".join(f"{name} ({os.path.basename(path)}:{line})" for path, name, line in stack)] += 1
+
+    def seconds(self, count):
+        return count * self.elapsed / self.ticks if self.ticks else 0.0
+
+    def print_hot_lines(self, file=sys.stderr, limit=PROFILE_LIMIT):
+        print(f"Hot lines ({sum(self.self_counts.values())} samples, one every {self.interval * 1000:g} ms)", file=file)
+        print(f"{'self %':>8} {'self s':>9} {'total %':>8} {'total s':>9}  line", file=file)
+        for frame, count in self.self_counts.most_common(limit):
+            path, name, line = frame
+            total = self.total_counts[frame]
+            text = linecache.getline(path, line).strip()
+            print(f"{count / self.ticks:8.1%} {self.seconds(count):9.3f} {total / self.ticks:8.1%} {self.seconds(total):9.3f}"
+                  f"  {os.path.basename(path)}:{line} {name}: {text}", file=file)
+
+    def write_collapsed(self, path):
+        # One "outer;inner count" line per distinct stack, the input format
+        # of flamegraph.pl, speedscope and inferno.
+        with open(path, 'w') as file:
+            for stack, count in sorted(self.stacks.items()):
+                file.write(f"{stack} {count}\n")
+
+def profile(file_path, sort="cumulative", collapsed_path=None, limit=PROFILE_LIMIT, cache=True):
+    # Runs the program under cProfile for call counts and times per
+    # CobraLang function, and under a LineSampler for time per .cl line.
+    # The code is compiled with the .cl path and line numbers, so both can
+    # tell CobraLang frames apart from the interpreter's own.
+    code = compile_file(file_path, cache)
+    install_importer(os.path.dirname(file_path), cache=cache)
+    profiler = cProfile.Profile()
+    sampler = LineSampler()
+    sampler.start()
+    profiler.enable()
+    try:
+        run_code(code, {"__name__": "__main__", "__file__": file_path})
+    finally:
+        profiler.disable()
+        sampler.stop()
+        sys.stdout.flush()
+        print(f"\nProfile of {file_path}: {sampler.elapsed:.3f} s", file=sys.stderr)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats(sort).print_stats(r"\.cl:", limit)
+        sampler.print_hot_lines(limit=limit)
+        if collapsed_path:
+            sampler.write_collapsed(collapsed_path)
+            print(f"\nCollapsed stacks written to {collapsed_path}", file=sys.stderr)
+
+def build_file(source_path, output_path, force=False):
+    # Writes the parsed program back out as a .py, and its .pyc. The .py ends with a comment
+    # holding the cache key of the source, so a file whose mtime changed but
+    # whose contents did not (a fresh checkout, say) is still skipped.
+    start = time.perf_counter()
+    try:
+        if not force and os.path.exists(output_path):
+            newest_input = max(os.path.getmtime(source_path), os.path.getmtime(__file__))
+            if os.path.getmtime(output_path) >= newest_input:
+                return source_path, "up to date", time.perf_counter() - start
+
+        with open(source_path, 'rb') as file:
+            source = file.read()
+        marker = f"# cobralang {cache_key(source).hex()}\n"
+
+        if not force and os.path.exists(output_path):
+            with open(output_path, 'rb') as file:
+                file.seek(max(0, os.path.getsize(output_path) - len(marker)))
+                if file.read().decode(errors='replace') == marker:
+                    os.utime(output_path)
+                    return source_path, "up to date", time.perf_counter() - start
+
+        tree = cl_to_ast(source.decode(), source_path)
+        code = compile(tree, source_path, 'exec')
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, 'w') as output:
+            output.write(ast.unparse(tree))
+            output.write("\n")
+            output.write(marker)
+        write_pyc(code, output_path)
+        return source_path, "built", time.perf_counter() - start
+    except (OSError, UnicodeDecodeError) as e:
+        return source_path, f"error: {e}", time.perf_counter() - start
+    except SyntaxError as e:
+        return source_path, f"error: {e.msg} (line {e.lineno})", time.perf_counter() - start
+
+def write_pyc(code, output_path):
+    # The .pyc is compiled from the CobraLang AST rather than from the .py,
+    # so tracebacks point at lines of the .cl file. Its header carries the
+    # .py's mtime and size, which is what the import system validates.
+    stat = os.stat(output_path)
+    data = bytearray(importlib.util.MAGIC_NUMBER)
+    data.extend((0).to_bytes(4, 'little'))
+    data.extend((int(stat.st_mtime) & 0xFFFFFFFF).to_bytes(4, 'little'))
+    data.extend((stat.st_size & 0xFFFFFFFF).to_bytes(4, 'little'))
+    data.extend(marshal.dumps(code))
+    pyc_path = importlib.util.cache_from_source(output_path)
+    os.makedirs(os.path.dirname(pyc_path), exist_ok=True)
+    temporary_path = f"{pyc_path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+    os.replace(temporary_path, pyc_path)
+
+def build(source_dir, output_dir, jobs=None, force=False):
+    tasks = []
+    for directory, dirnames, filenames in os.walk(source_dir):
+        dirnames[:] = sorted(d for d in dirnames if d != CACHE_DIR_NAME)
+        for filename in sorted(filenames):
+            if filename.endswith(".cl"):
+                source_path = os.path.join(directory, filename)
+                relative_path = os.path.relpath(source_path, source_dir)
+                output_path = os.path.join(output_dir, relative_path[:-3] + ".py")
+                tasks.append((source_path, output_path))
+
+    if not tasks:
+        return []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(build_file, source_path, output_path, force)
+                   for source_path, output_path in tasks]
+        return [future.result() for future in futures]
+
+def build_main(argv):
+    parser = argparse.ArgumentParser(prog="transl.py build",
+                                     description="Translate and byte-compile every .cl file under a directory.")
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rebuild files that are already up to date")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = build(args.source_dir, args.output_dir, args.jobs, args.force)
+    failed = 0
+    for source_path, status, seconds in results:
+        print(f"{seconds * 1000:9.1f} ms  {source_path}: {status}")
+        failed += status.startswith("error")
+    built = sum(status == "built" for _, status, _ in results)
+    print(f"{len(results)} files, {built} built, {len(results) - built - failed} up to date, "
+          f"{failed} failed in {time.perf_counter() - start:.2f} s")
+    return 1 if failed else 0
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["build"]:
+        return build_main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog="transl.py", description="Run a CobraLang program.",
+                                     epilog="Use 'transl.py build SRC OUT' to compile a directory tree.")
+    parser.add_argument("file", nargs="?", help="the .cl file to run, or - for stdin with --emit-py")
+    parser.add_argument("--emit-py", action="store_true",
+                        help="print the translated Python source instead of running it")
+    parser.add_argument("-o", "--output", help="write --emit-py output to this file instead of stdout")
+    parser.add_argument("--check-speed", action="store_true",
+                        help="check compile_cl against TARGET_LINES_PER_SECOND")
+    parser.add_argument("--buffered-output", action="store_true",
+                        help=f"buffer program output and write it in large blocks ({OUTPUT_BUFFER_SIZE // 1024} KB)")
+    parser.add_argument("--output-buffer-size", type=int, metavar="BYTES",
+                        help="buffer program output in blocks of BYTES; implies --buffered-output")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="stop the program with a TimeoutError after SECONDS")
+    parser.add_argument("--timings", action="store_true",
+                        help="report time and memory per phase and the slowest statements to parse on stderr")
+    parser.add_argument("--timings-json", metavar="FILE",
+                        help="write the --timings report as JSON to FILE instead")
+    parser.add_argument("--remember-stats", action="store_true",
+                        help="print cache hits and misses of every remember define function on exit")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the program and report time per CobraLang function and line on stderr")
+    parser.add_argument("--profile-sort", default="cumulative",
+                        choices=sorted(pstats.Stats.sort_arg_dict_default),
+                        help="order of the --profile function table (default: cumulative)")
+    parser.add_argument("--collapsed", metavar="FILE",
+                        help="with --profile, also write collapsed stacks for flame graph tools to FILE")
+    args = parser.parse_args(argv)
+
+    if args.check_speed:
+        return 0 if check_speed() else 1
+    if args.file is None:
+        parser.error("the following arguments are required: file")
+
+    if args.emit_py:
+        if args.output:
+            with open(args.output, 'w') as output:
+                emit_py(args.file, output)
+        else:
+            emit_py(args.file)
+        return 0
+
+    if args.profile:
+        profile(args.file, args.profile_sort, args.collapsed)
+        return 0
+
+    output_buffer_size = args.output_buffer_size
+    if args.buffered_output and output_buffer_size is None:
+        output_buffer_size = OUTPUT_BUFFER_SIZE
+    timings = Timings() if args.timings or args.timings_json else None
     try:
-        translate(sys.argv[1])
-    except:
-        sys.exit("Usage: python transl.py <file_name>")
\ No newline at end of file
+        translate(args.file, output_buffer_size=output_buffer_size, timeout=args.timeout, timings=timings)
+    finally:
+        if args.remember_stats:
+            sys.stdout.flush()
+            remember_report()
+        if timings is not None:
+            sys.stdout.flush()
+            if args.timings_json:
+                with open(args.timings_json, 'w') as output:
+                    json.dump(timings.as_dict(), output, indent=2)
+            else:
+                print(f"\nTimings for {args.file}", file=sys.stderr)
+                timings.report()
+    return 0
+
+if __name__ == "__main__":
+    # Programs import this module as `transl` for their array helpers; make
+    # that the running script rather than a second copy of it.
+    sys.modules.setdefault("transl", sys.modules[__name__])
+    sys.exit(main())
\ No newline at end of file
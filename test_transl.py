@@ -0,0 +1,225 @@
+import ast
+import textwrap
+import unittest
+
+import transl
+
+
+def parse(source):
+    return transl.cl_to_ast(textwrap.dedent(source), "<test>")
+
+
+# Python that CobraLang accepts unchanged. Each one must give the same tree
+# as ast.parse, positions included.
+PYTHON_SOURCES = [
+    "x = 1\n",
+    "x = y = 2\n",
+    "a, *b = c\n",
+    "x += 1\nx //= 2\nx **= 3\n",
+    "x: int = 5\n",
+    "(x): int = 5\n",
+    "output: list = []\n",
+    "output, _ = 1, 2\n",
+    "repeat(True)\n",
+    "value = a if b else c\n",
+    "ok = 1 < x <= 10 != y\n",
+    "ok = a is not b and c not in d or not e\n",
+    "n = -x ** 2 + ~y // 3 % 4 @ m\n",
+    "bits = a << 1 | b >> 2 & c ^ d\n",
+    "if (n := len(items)) > 10:\n    pass\n",
+    "f(x for x in y)\n",
+    "f(a, *b, c=1, **d)\n",
+    "total = sum(x * x for x in range(10) if x % 2)\n",
+    "pairs = [(a, b) for a in x for b in y]\n",
+    "lookup = {k: v for k, v in items}\n",
+    "seen = {x for x in y}\n",
+    "merged = {**a, 'b': 1}\n",
+    "parts = xs[1:2], xs[::2], xs[a, 1:]\n",
+    "shape = tuple[*Ts]\n",
+    "square = lambda x, *, y=2: x * y\n",
+    "text = u'caf\\xe9'\n",
+    "text = b'ab' b'cd'\n",
+    "text = 'a' 'b'\n",
+    "import os.path as p\nfrom . import a\nfrom ..b import (c, d as e)\n",
+    "del a[0], b.c\n",
+    "assert x, 'message'\n",
+    "raise ValueError('bad') from error\n",
+    "global a, b\n",
+    "for i, x in enumerate(xs):\n    continue\nelse:\n    pass\n",
+    "while x:\n    break\nelse:\n    x = 1\n",
+    "if a:\n    pass\nelif b:\n    pass\nelse:\n    pass\n",
+    "class Node(Base, metaclass=Meta):\n    size = 0\n",
+    "@property\ndef f(self, a: int = 1, *args: str, b, **kwargs) -> int:\n    yield a\n    yield from b\n",
+    "def f(a, /, b):\n    nonlocal_value = a\n    return\n",
+    "try:\n    pass\nexcept (A, B) as e:\n    raise\nexcept C:\n    pass\nelse:\n    pass\nfinally:\n    pass\n",
+    "try:\n    pass\nexcept* ValueError as group:\n    pass\nexcept* (TypeError, KeyError):\n    pass\n",
+    "with open(a) as f, open(b) as g:\n    pass\n",
+    "with a as (x, y), b:\n    pass\n",
+    "with (open(a) as f, open(b) as g,):\n    pass\n",
+    "with (a, b):\n    pass\n",
+    "with (yield):\n    pass\n",
+    "async def f(xs):\n    async for x in xs:\n        await x\n    async with lock as held, other:\n        return [y async for y in xs]\n",
+    "@decorator\nasync def f():\n    pass\n",
+    "match command.split():\n"
+    "    case [action]:\n"
+    "        pass\n"
+    "    case ['go', direction] | ['move', direction] if direction:\n"
+    "        pass\n"
+    "    case [first, *rest]:\n"
+    "        pass\n"
+    "    case Point(x=0, y=0) | Point(0, 0):\n"
+    "        pass\n"
+    "    case {'x': x, **others}:\n"
+    "        pass\n"
+    "    case (1 | -2 | 3.5 | 1 + 2j | 'text' | None | True) as value:\n"
+    "        pass\n"
+    "    case Color.RED:\n"
+    "        pass\n"
+    "    case _:\n"
+    "        pass\n",
+    "match = 1\nmatch(x)\nmatch.group(1)\n",
+]
+
+# f-strings keep their structure, but CobraLang places every part at the
+# whole string.
+FSTRING_SOURCES = [
+    "s = f'{a!r:>{width}} and {b}'\n",
+    "s = f'{x=}'\n",
+    "s = f'{a}\\N{BULLET}{b}'\n",
+    "s = f'''a\"{b}\\\\'''\n",
+    "s = rf'\\{x}\\d'\n",
+    "s = f\"{'''it's'''}\"\n",
+]
+
+# Each CobraLang phrase and the Python it stands for.
+PHRASES = [
+    ("x becomes 5", "x = 5"),
+    ("x becomes a add b", "x = a + b"),
+    ("x becomes a subtract b", "x = a - b"),
+    ("x becomes a multiply b", "x = a * b"),
+    ("x becomes a divide b", "x = a / b"),
+    ("x becomes a integer divide b", "x = a // b"),
+    ("x becomes a modulus b", "x = a % b"),
+    ("x becomes a power b", "x = a ** b"),
+    ("x becomes a is equal to b", "x = a == b"),
+    ("x becomes a is not equal to b", "x = a != b"),
+    ("x becomes a is greater than b", "x = a > b"),
+    ("x becomes a is less than b", "x = a < b"),
+    ("x becomes a is at least b", "x = a >= b"),
+    ("x becomes a is at most b", "x = a <= b"),
+    ("x becomes a is positive and b is negative", "x = a > 0 and b < 0"),
+    ("x becomes a is zero", "x = a == 0"),
+    ("x becomes a within b", "x = a in b"),
+    ("x becomes true or false or nothing", "x = True or False or None"),
+    ("output 'Hello'", "print('Hello')"),
+    (
+        """
+        if a is greater than 10:
+            pass
+        else if a is less than 5:
+            pass
+        otherwise:
+            pass
+        """,
+        "if a > 10:\n    pass\nelif a < 5:\n    pass\nelse:\n    pass",
+    ),
+    ("repeat i from 1 to 10:\n    skip", "for i in range(1, 10 + 1):\n    continue"),
+    ("loop while x is less than 10:\n    exit", "while x < 10:\n    break"),
+    ("define greet(name):\n    give name", "def greet(name):\n    return name"),
+    (
+        """
+        class Person:
+            define _initialize(own, name):
+                own.name becomes name
+        """,
+        "class Person:\n    __slots__ = ('name', '__weakref__')\n\n"
+        "    def __init__(own, name):\n        own.name = name",
+    ),
+    (
+        """
+        dynamic class Record:
+            define _initialize(own):
+                own.created becomes true
+        """,
+        "class Record:\n\n    def __init__(own):\n        own.created = True",
+    ),
+    (
+        "remember define fib(n):\n    give n",
+        "import transl as _cobralang\n\n@_cobralang.remember()\ndef fib(n):\n    return n",
+    ),
+    (
+        "remember define fib(n) keeping 500 results:\n    give n",
+        "import transl as _cobralang\n\n@_cobralang.remember(500)\ndef fib(n):\n    return n",
+    ),
+    (
+        "numbers becomes array from 1 to 10",
+        "import transl as _cobralang\nnumbers = _cobralang.array_range(1, 10)",
+    ),
+    (
+        "prices becomes array of [3, 5, 8]",
+        "import transl as _cobralang\nprices = _cobralang.to_array([3, 5, 8])",
+    ),
+    (
+        "total becomes sum of n multiply n",
+        "import transl as _cobralang\ntotal = _cobralang.sum_of(n * n)",
+    ),
+    (
+        "define get(url):\n    give wait for fetch(url)",
+        "async def get(url):\n    return await fetch(url)",
+    ),
+    (
+        "repeat in parallel t from 1 to 1000 using 4 workers into results:\n    give t",
+        "import transl as _cobralang\n\ndef _parallel_body(t):\n    return t\n"
+        "results = _cobralang.parallel_repeat(_parallel_body, 1, 1000 + 1, 4)",
+    ),
+]
+
+
+class PythonSourceTest(unittest.TestCase):
+    def test_matches_ast_parse(self):
+        for source in PYTHON_SOURCES:
+            with self.subTest(source=source):
+                expected = ast.dump(ast.parse(source), include_attributes=True)
+                self.assertEqual(ast.dump(parse(source), include_attributes=True), expected)
+
+    def test_fstrings_match_ast_parse(self):
+        for source in FSTRING_SOURCES:
+            with self.subTest(source=source):
+                self.assertEqual(ast.dump(parse(source)), ast.dump(ast.parse(source)))
+
+    def test_statements_end_with_their_body(self):
+        tree = parse("if a:\n    b = 1\n\nc = 2\n")
+        self.assertEqual((tree.body[0].end_lineno, tree.body[0].end_col_offset), (2, 9))
+
+    def test_rejects_mixed_except_forms(self):
+        with self.assertRaises(SyntaxError):
+            parse("try:\n    pass\nexcept A:\n    pass\nexcept* B:\n    pass\n")
+
+
+class PhraseTest(unittest.TestCase):
+    def test_phrases(self):
+        for source, python in PHRASES:
+            with self.subTest(source=source):
+                self.assertEqual(ast.dump(parse(source)), ast.dump(ast.parse(python)))
+
+    def test_concurrently_gathers_statements(self):
+        tree = parse("""
+            define load():
+                concurrently:
+                    a becomes read(1)
+                    b becomes read(2)
+                give a add b
+        """)
+        function = tree.body[-1]
+        self.assertIsInstance(function, ast.AsyncFunctionDef)
+        tasks = [node for node in function.body if isinstance(node, ast.FunctionDef)]
+        self.assertEqual(len(tasks), 2)
+        self.assertTrue(any(isinstance(node, ast.Await) for node in ast.walk(function)))
+
+    def test_constants_cannot_be_assigned(self):
+        with self.assertRaises(SyntaxError):
+            parse("nothing becomes 1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()